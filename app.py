@@ -1,27 +1,282 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, session
-from werkzeug.security import generate_password_hash, check_password_hash
-from werkzeug.utils import secure_filename
-import os
+from flask import Flask, Response, current_app, render_template, request, jsonify, redirect, url_for, flash, session, stream_with_context
+from flask.cli import with_appcontext
 from datetime import datetime, timedelta
 from models import db, User, Karyawan, Product, TransaksiPenjualan, DetailTransaksiPenjualan, TransaksiPembelian, DetailTransaksiPembelian
 from config import Config
-from sqlalchemy import func
-import calendar
-import json
+from dashboard import get_dashboard_metrics, invalidate_dashboard, get_time_series, INTERVALS
+from cache import cache
+from search_index import product_index
+from fulltext import search_products
+from migrations import upgrade, current_version
+from replica import read_replica
+from principal import current_principal, current_owner_id, forget_principal
+from passwords import passwords, login_limiter, PasswordBusy
+from metrics import metrics
+from profiler import profiler, HEADER as PROFILER_HEADER
+from images import image_processor, save_image, image_url, image_status, ImageBusy, PRODUCT_SIZES, PROFILE_SIZES
+from assets import assets
+from rollup import apply_rollup, rebuild_rollup
+from laporan import get_laporan, month_bounds, save_snapshot
+from pagination import keyset_page
+from product_import import import_products
+from export import export_rows, stream_csv, stream_xlsx, Workbook
+from sqlalchemy.orm import joinedload, selectinload
+import click
+from sqlalchemy import func, insert, update, delete, select
+import io
+
+# Route dan command CLI dikumpulkan saat modul diimpor, lalu didaftarkan oleh create_app().
+# Mengimpor modul ini tidak membuka koneksi database; skema dibuat/di-upgrade lewat `flask upgrade-db`.
+routes = []
+commands = []
+
+def route(rule, **options):
+    def decorator(view):
+        routes.append((rule, view, options))
+        return view
+    return decorator
+
+def command(name):
+    def decorator(f):
+        cmd = click.command(name)(with_appcontext(f))
+        commands.append(cmd)
+        return cmd
+    return decorator
+
+def parse_tanggal(value):
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+def parse_cart():
+    # Baca semua baris keranjang dulu sebelum menyentuh database
+    product_ids = request.form.getlist('products[][product_id]')
+    quantities = request.form.getlist('products[][quantity]')
+
+    cart = []
+    for product_id, quantity in zip(product_ids, quantities):
+        if not product_id or not quantity:
+            continue
+        cart.append((int(product_id), int(quantity)))
+    return cart
+
+def load_cart_products(owner_id, cart):
+    # Semua produk di keranjang diambil dengan satu query IN (...) milik owner
+    product_ids = {product_id for product_id, _ in cart}
+    products = {}
+    if product_ids:
+        products = {product.id: product for product in
+                    Product.query.filter(Product.id.in_(product_ids), Product.user_id == owner_id)}
+    for product_id in product_ids:
+        if product_id not in products:
+            raise ValueError(f'Produk dengan ID {product_id} tidak ditemukan.')
+    return products
+
+def adjust_stock(product_id, delta):
+    # Update stok langsung di database (stock = stock + delta) supaya checkout paralel
+    # tidak saling menimpa; pengurangan hanya berhasil kalau stoknya cukup
+    query = update(Product).where(Product.id == product_id)
+    if delta < 0:
+        query = query.where(Product.stock >= -delta)
+    result = db.session.execute(query.values(stock=Product.stock + delta),
+                                execution_options={'synchronize_session': False})
+    return result.rowcount == 1
+
+def apply_stock_changes(changes, products):
+    # Urutan product id yang tetap supaya dua checkout tidak saling deadlock
+    kurang = []
+    for product_id in sorted(changes):
+        if changes[product_id] and not adjust_stock(product_id, changes[product_id]):
+            kurang.append(products[product_id].name)
+    if kurang:
+        raise ValueError(f'Stok produk {", ".join(kurang)} tidak mencukupi.')
+
+def hapus_transaksi(model, detail_model, transaksis):
+    # Stok semua produk dikembalikan dengan satu UPDATE berkelompok,
+    # lalu detail dan transaksinya dihapus dengan satu DELETE masing-masing
+    penjualan = model is TransaksiPenjualan
+    ids = [transaksi.id for transaksi in transaksis]
+    in_transaksi = detail_model.transaksi_id.in_(ids)
+    product_ids = [product_id for product_id, in
+                   db.session.query(detail_model.product_id).filter(in_transaksi).distinct()]
+
+    terjual = {}
+    if penjualan:
+        terjual = dict(db.session.query(detail_model.transaksi_id, func.sum(detail_model.jumlah))
+                       .filter(in_transaksi).group_by(detail_model.transaksi_id))
+
+    ringkasan = {}
+    for transaksi in transaksis:
+        key = (transaksi.user_id, transaksi.tanggal)
+        total, jumlah_transaksi, barang = ringkasan.get(key, (0, 0, 0))
+        ringkasan[key] = (total + transaksi.total_harga, jumlah_transaksi + 1, barang + (terjual.get(transaksi.id) or 0))
+
+    jumlah = select(func.sum(detail_model.jumlah)) \
+        .where(detail_model.product_id == Product.id, in_transaksi).scalar_subquery()
+    stock = Product.stock + jumlah if penjualan else Product.stock - jumlah
+    sync = {'synchronize_session': False}
+    db.session.execute(update(Product).where(Product.id.in_(select(detail_model.product_id).where(in_transaksi)))
+                       .values(stock=stock), execution_options=sync)
+    db.session.execute(delete(detail_model).where(in_transaksi), execution_options=sync)
+    db.session.execute(delete(model).where(model.id.in_(ids)), execution_options=sync)
+
+    for (owner_id, tanggal), (total, jumlah_transaksi, barang) in ringkasan.items():
+        if penjualan:
+            apply_rollup(owner_id, tanggal, total_penjualan=-total, jumlah_penjualan=-jumlah_transaksi,
+                         barang_terjual=-barang)
+        else:
+            apply_rollup(owner_id, tanggal, total_pembelian=-total, jumlah_pembelian=-jumlah_transaksi)
+    return product_ids
+
+def load_transaksi_terpilih(model, owner_id):
+    # Transaksi yang dicentang; karyawan hanya boleh memilih transaksinya sendiri
+    ids = {int(transaksi_id) for transaksi_id in request.form.getlist('transaksi_ids') if transaksi_id.isdigit()}
+    if not ids:
+        return []
+    query = model.query.filter(model.id.in_(ids), model.user_id == owner_id)
+    if session.get('role') == 'karyawan':
+        query = query.filter(model.karyawan_id == session.get('user_id'))
+    transaksis = query.all()
+    if len(transaksis) != len(ids):
+        return None
+    return transaksis
+
+def filter_transaksi(model, owner_id):
+    # Filter tanggal dari/sampai dan karyawan dari query string; dipakai daftar dan ekspor transaksi
+    filters = {'from': request.args.get('from', ''), 'to': request.args.get('to', ''),
+               'karyawan': request.args.get('karyawan', '')}
+    conditions = [model.user_id == owner_id]
+    valid = True
+    try:
+        if filters['from']:
+            conditions.append(model.tanggal >= parse_tanggal(filters['from']))
+        if filters['to']:
+            conditions.append(model.tanggal <= parse_tanggal(filters['to']))
+    except ValueError:
+        valid = False
+    if filters['karyawan'] == 'pemilik':
+        conditions.append(model.karyawan_id.is_(None))
+    elif filters['karyawan'].isdigit():
+        conditions.append(model.karyawan_id == int(filters['karyawan']))
+    return conditions, filters, valid
+
+def transaksi_page(model, owner_id):
+    # Daftar transaksi per halaman
+    conditions, filters, valid = filter_transaksi(model, owner_id)
+    if not valid:
+        flash('Format tanggal tidak valid.', 'danger')
+    query = model.query.options(joinedload(model.user), joinedload(model.karyawan)).filter(*conditions)
+
+    limit = min(request.args.get('limit', current_app.config['TRANSAKSI_PER_PAGE'], type=int), 200)
+    transaksis, next_cursor = keyset_page(query, model, request.args.get('cursor'), max(limit, 1))
+    return transaksis, next_cursor, filters
+
+def transaksi_json(transaksis, next_cursor, detail_endpoint):
+    items = [
+        {
+            'id': transaksi.id,
+            'tanggal': transaksi.tanggal.isoformat(),
+            'total_harga': transaksi.total_harga,
+            'oleh': transaksi.user.nama_pemilik if transaksi.karyawan is None else transaksi.karyawan.nama_karyawan,
+            'detail_url': url_for(detail_endpoint, transaksi_id=transaksi.id),
+        }
+        for transaksi in transaksis
+    ]
+    return jsonify({'items': items, 'next_cursor': next_cursor})
 
-app = Flask(__name__)
-app.config.from_object(Config)
-db.init_app(app)
+def export_transaksi(model, detail_model, nama):
+    # File dikirim sambil dibaca dari database, jadi memori worker tidak bergantung pada jumlah baris
+    owner_id = current_owner_id()
+    if not owner_id:
+        return redirect(url_for('login'))
+    conditions, filters, valid = filter_transaksi(model, owner_id)
+    if not valid:
+        return 'Format tanggal tidak valid.', 400
+
+    filename = '_'.join(part for part in (nama, filters['from'], filters['to']) if part)
+    rows = export_rows(model, detail_model, conditions)
+    if request.args.get('format') == 'xlsx':
+        if Workbook is None:
+            return 'Ekspor XLSX membutuhkan paket openpyxl.', 501
+        return Response(stream_with_context(stream_xlsx(rows, nama)),
+                        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+                        headers={'Content-Disposition': f'attachment; filename="{filename}.xlsx"'})
+    return Response(stream_with_context(stream_csv(rows)), mimetype='text/csv',
+                    headers={'Content-Disposition': f'attachment; filename="{filename}.csv"'})
+
+@command('upgrade-db')
+def upgrade_db():
+    for version, nama in upgrade():
+        click.echo(f'Migrasi {version}: {nama}')
+    click.echo(f'Skema pada versi {current_version()}.')
+
+@command('rebuild-ringkasan')
+@click.option('--owner-id', type=int, default=None, help='Hanya bangun ulang ringkasan milik pemilik ini.')
+def rebuild_ringkasan(owner_id):
+    jumlah = rebuild_rollup(owner_id)
+    cache.clear()
+    click.echo(f'{jumlah} baris ringkasan harian dibangun ulang.')
+
+@command('snapshot-laporan')
+@click.option('--bulan', default=None, help='Bulan yang ditutup (YYYY-MM), bawaan bulan lalu.')
+def snapshot_laporan(bulan):
+    if bulan:
+        try:
+            bulan = datetime.strptime(bulan, '%Y-%m').date()
+        except ValueError:
+            raise click.ClickException('Format bulan harus YYYY-MM.')
+    else:
+        bulan = (datetime.today().date().replace(day=1) - timedelta(days=1)).replace(day=1)
+    if bulan >= datetime.today().date().replace(day=1):
+        raise click.ClickException('Hanya bulan yang sudah tutup yang bisa dibuat snapshot-nya.')
+    owner_ids = [owner_id for owner_id, in db.session.query(User.id)]
+    for owner_id in owner_ids:
+        save_snapshot(owner_id, bulan)
+        db.session.commit()
+    click.echo(f'Snapshot laporan {bulan:%Y-%m} dibuat untuk {len(owner_ids)} pemilik.')
+
+@command('import-produk')
+@click.argument('owner_id', type=int)
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--batch-size', type=int, default=None, help='Jumlah baris per batch insert/update.')
+def import_produk_cli(owner_id, path, batch_size):
+    if User.query.get(owner_id) is None:
+        raise click.ClickException(f'Pemilik dengan id {owner_id} tidak ditemukan.')
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        try:
+            result = import_products(owner_id, f, batch_size or current_app.config['IMPORT_BATCH_SIZE'])
+        except ValueError as e:
+            raise click.ClickException(str(e))
+    for line, message in result.errors:
+        click.echo(f'Baris {line}: {message}', err=True)
+    click.echo(f'{result.inserted} produk ditambahkan, {result.updated} diperbarui, {result.failed} baris gagal.')
+
+@command('profiler-token')
+def profiler_token():
+    if not current_app.config.get('PROFILER_ENABLED'):
+        raise click.ClickException('Profiler tidak aktif, set PROFILER_ENABLED=1.')
+    if not current_app.config.get('PROFILER_SECRET'):
+        raise click.ClickException('PROFILER_SECRET belum diisi; token harus ditandatangani dengan kunci yang sama dengan server.')
+    token = profiler.make_token()
+    click.echo(token)
+    click.echo(f'Berlaku {current_app.config["PROFILER_TOKEN_MAX_AGE"]} detik; kirim sebagai header '
+               f'{PROFILER_HEADER}: <token> atau ?_profile=<token>.', err=True)
+
+def check_login(account, password):
+    # Cocokkan password; hash lama di-upgrade ke PASSWORD_HASH_METHOD saat login berhasil
+    if not passwords.check(account.password, password):
+        return False
+    if passwords.needs_rehash(account.password):
+        account.password = passwords.hash(password)
+        db.session.commit()
+    return True
 
-# Create the database and tables
-with app.app_context():
-    db.create_all()
+def server_busy(error):
+    return str(error), 503, {'Retry-After': '5'}
 
-@app.route('/')
+@route('/')
 def index():
     return render_template('login_pemilik.html')
 
-@app.route('/login', methods=['GET', 'POST'])
+@route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
         username = request.form['username']
@@ -33,19 +288,27 @@ def login():
         session.pop('owner_id', None)
         session.pop('role', None)
         
+        ip = request.remote_addr or ''
+        if not login_limiter.allow(username, ip):
+            flash('Terlalu banyak percobaan login gagal. Coba lagi beberapa menit lagi.', 'danger')
+            return render_template('login_pemilik.html'), 429
+
         user = User.query.filter_by(username=username).first()
         
-        if user and check_password_hash(user.password, password):
+        if user and check_login(user, password):
+            login_limiter.succeeded(username)
             session['user_id'] = user.id
+            session['owner_id'] = user.id
             session['role'] = 'pemilik'
             flash('Login berhasil!', 'success')
             return redirect(url_for('beranda'))
         else:
+            login_limiter.failed(username, ip)
             flash('Login gagal. Periksa username dan password.', 'danger')
     
     return render_template('login_pemilik.html')
 
-@app.route('/login/karyawan', methods=['GET', 'POST'])
+@route('/login/karyawan', methods=['GET', 'POST'])
 def login_karyawan():
     if request.method == 'POST':
         username = request.form['username']
@@ -57,9 +320,15 @@ def login_karyawan():
         session.pop('owner_id', None)
         session.pop('role', None)
 
+        ip = request.remote_addr or ''
+        if not login_limiter.allow(username, ip):
+            flash('Terlalu banyak percobaan login gagal. Coba lagi beberapa menit lagi.', 'danger')
+            return render_template('login_karyawan.html'), 429
+
         karyawan = Karyawan.query.filter_by(username=username).first()
         
-        if karyawan and check_password_hash(karyawan.password, password):
+        if karyawan and check_login(karyawan, password):
+            login_limiter.succeeded(username)
             session['user_id'] = karyawan.id
             session['karyawan_id'] = karyawan.id
             session['owner_id'] = karyawan.owner_id
@@ -67,22 +336,26 @@ def login_karyawan():
             flash('Login berhasil!', 'success')
             return redirect(url_for('beranda'))
         else:
+            login_limiter.failed(username, ip)
             flash('Login gagal. Periksa username dan password.', 'danger')
     
     return render_template('login_karyawan.html')
   
-@app.route('/daftar', methods=['GET', 'POST'])
+@route('/daftar', methods=['GET', 'POST'])
 def daftar():
     if request.method == 'POST':
         nama_toko = request.form['nama_toko']
         nama_pemilik = request.form['nama_pemilik']
         username = request.form['username']
-        password = generate_password_hash(request.form['password'])
+        password = passwords.hash(request.form['password'])
         email = request.form['email']
         phone = request.form['phone']
         profile_pic = request.files['profile_pic']
-        image_filename = secure_filename(profile_pic.filename)
-        profile_pic.save(os.path.join(app.config['FOLDER_PROFILE_P'], image_filename))
+        try:
+            image_filename = save_image(profile_pic, current_app.config['FOLDER_PROFILE_P'], PROFILE_SIZES)
+        except ValueError as e:
+            flash(str(e), 'danger')
+            return redirect(url_for('daftar'))
 
         new_user = User(
             nama_toko=nama_toko,
@@ -99,176 +372,99 @@ def daftar():
         return redirect(url_for('login'))
     return render_template('daftar.html')
 
-@app.route('/logout')
+@route('/logout')
 def logout():
     session.clear()
     return redirect(url_for('login'))
 
-@app.route("/beranda")
+@route("/beranda")
+@read_replica
 def beranda():
-    if 'user_id' in session:
-        user_id = session.get('user_id')
-        role = session.get('role')
-        user = User.query.get(user_id)
-        if role == 'pemilik':
-            nama_toko = user.nama_toko
-        else:
-            karyawan = Karyawan.query.filter_by(id=user.id).first()
-            if karyawan:
-                nama_toko = karyawan.owner.nama_toko
-            else:
-                nama_toko = 'Toko Tidak Diketahui'
+    principal = current_principal()
+    if not principal:
+        return redirect(url_for('login'))
+    owner_id = current_owner_id()
+    nama_toko = principal['nama_toko']
 
-    # Pemasukan dan pengeluaran
+    # Pemasukan, pengeluaran dan laba bersih
     today = datetime.today().date()
-    start_of_month = today.replace(day=1)
-    
-    if 'user_id' in session:
-        user_id = session.get('user_id')
-        role = session.get('role')
-        user = User.query.get(user_id)
-        if role == 'pemilik':
-            user_filter = TransaksiPenjualan.user_id == user.id
-            user_filter_pembelian = TransaksiPembelian.user_id == user.id
-        else:
-            karyawan = Karyawan.query.filter_by(id=user.id).first()
-            user_filter = TransaksiPenjualan.user_id == karyawan.owner_id
-            user_filter_pembelian =  TransaksiPembelian.user_id == karyawan.owner_id 
-    
-        # Pemasukan
-        daily_sales = db.session.query(func.sum(TransaksiPenjualan.total_harga)) \
-                                .filter(TransaksiPenjualan.tanggal == today, user_filter).scalar() or 0
-        monthly_sales = db.session.query(func.sum(TransaksiPenjualan.total_harga)) \
-                                .filter(TransaksiPenjualan.tanggal >= start_of_month, user_filter).scalar() or 0
-
-        yesterday = today - timedelta(days=1)
-        previous_month_start = (today.replace(day=1) - timedelta(days=1)).replace(day=1)
-        
-        daily_sales_yesterday = db.session.query(func.sum(TransaksiPenjualan.total_harga)) \
-                                        .filter(TransaksiPenjualan.tanggal == yesterday, user_filter).scalar() or 0
-        monthly_sales_last_month = db.session.query(func.sum(TransaksiPenjualan.total_harga)) \
-                                            .filter(TransaksiPenjualan.tanggal >= previous_month_start,
-                                                    TransaksiPenjualan.tanggal < start_of_month, 
-                                                    user_filter).scalar() or 0
-
-        if daily_sales_yesterday != 0:
-            daily_increase = ((daily_sales - daily_sales_yesterday) / daily_sales_yesterday * 100)
-        else:
-            daily_increase = 0
-
-        daily_increase = f"{daily_increase:.2f}%"
-
-        if daily_sales > daily_sales_yesterday:
-            daily_increase = f"+{daily_increase}"
-        elif daily_sales < daily_sales_yesterday:
-            daily_increase = f"{daily_increase}"
-
-        if monthly_sales_last_month != 0:
-            monthly_increase = ((monthly_sales - monthly_sales_last_month) / monthly_sales_last_month * 100)
-        else:
-            monthly_increase = 0
-
-        monthly_increase = f"{monthly_increase:.2f}%"
-
-        if monthly_sales > monthly_sales_last_month:
-            monthly_increase = f"+{monthly_increase}"
-        elif monthly_sales < monthly_sales_last_month:
-            monthly_increase = f"{monthly_increase}"
-
-        # Pengeluaran
-        daily_purchases = db.session.query(func.sum(TransaksiPembelian.total_harga)) \
-                                .filter(TransaksiPembelian.tanggal == today, user_filter_pembelian).scalar() or 0
-        monthly_purchases = db.session.query(func.sum(TransaksiPembelian.total_harga)) \
-                                .filter(TransaksiPembelian.tanggal >= start_of_month, user_filter_pembelian).scalar() or 0
-
-        yesterday = today - timedelta(days=1)
-        previous_month_start = (today.replace(day=1) - timedelta(days=1)).replace(day=1)
-        
-        daily_purchases_yesterday = db.session.query(func.sum(TransaksiPembelian.total_harga)) \
-                                        .filter(TransaksiPembelian.tanggal == yesterday, user_filter_pembelian).scalar() or 0
-        monthly_purchases_last_month = db.session.query(func.sum(TransaksiPembelian.total_harga)) \
-                                            .filter(TransaksiPembelian.tanggal >= previous_month_start,
-                                                    TransaksiPembelian.tanggal < start_of_month, 
-                                                    user_filter).scalar() or 0
-
-        if daily_purchases_yesterday != 0:
-            daily_purchases_increase = ((daily_purchases - daily_purchases_yesterday) / daily_purchases_yesterday * 100)
-        else:
-            daily_purchases_increase = 0
-
-        daily_purchases_increase = f"{daily_purchases_increase:.2f}%"
+    ringkasan = get_dashboard_metrics(owner_id, today)
 
-        if daily_purchases > daily_purchases_yesterday:
-            daily_purchases_increase = f"+{daily_purchases_increase}"
-        elif daily_purchases < daily_purchases_yesterday:
-            daily_purchases_increase = f"{daily_purchases_increase}"
+    return render_template('beranda.html', nama_toko=nama_toko, **ringkasan)
 
-        if monthly_purchases_last_month != 0:
-            monthly_purchases_increase = ((monthly_purchases - monthly_purchases_last_month) / monthly_purchases_last_month * 100)
-        else:
-            monthly_purchases_increase = 0
-
-        monthly_purchases_increase = f"{monthly_purchases_increase:.2f}%"
-
-        if monthly_purchases > monthly_purchases_last_month:
-            monthly_purchases_increase = f"+{monthly_purchases_increase}"
-        elif monthly_purchases < monthly_purchases_last_month:
-            monthly_purchases_increase = f"{monthly_purchases_increase}"
+@route('/beranda/grafik')
+@read_replica
+def beranda_grafik():
+    # Data grafik penjualan, pembelian dan laba untuk N hari terakhir
+    owner_id = current_owner_id()
+    if not owner_id:
+        return jsonify({'items': []}), 403
 
-        # Laba Bersih
-        daily_profit = daily_sales - daily_purchases
-        daily_profit_yesterday = daily_sales_yesterday - daily_purchases_yesterday
-        monthly_profit = monthly_sales - monthly_purchases
-        monthly_profit_last_month = monthly_sales_last_month - monthly_purchases_last_month
-
-        if daily_profit_yesterday != 0:
-            daily_profit_increase = ((daily_profit - daily_profit_yesterday) / daily_profit_yesterday * 100)
-        else:
-            daily_profit_increase = 0
-
-        daily_profit_increase = f"{daily_profit_increase:.2f}%"
-
-        if daily_profit > daily_profit_yesterday:
-            daily_profit_increase = f"{daily_profit_increase}"
-        elif daily_profit < daily_profit_yesterday:
-            daily_profit_increase = f"{daily_profit_increase}"
-
-        if monthly_profit_last_month != 0:
-            monthly_profit_increase = ((monthly_profit - monthly_profit_last_month) / monthly_profit_last_month * 100)
-        else:
-            monthly_profit_increase = 0
+    days = min(max(request.args.get('days', 30, type=int), 1), 366)
+    interval = request.args.get('interval', 'day')
+    if interval not in INTERVALS:
+        return jsonify({'error': f'interval harus salah satu dari {", ".join(INTERVALS)}'}), 400
 
-        monthly_profit_increase = f"{monthly_profit_increase:.2f}%"
+    today = datetime.today().date()
+    items = get_time_series(owner_id, today, days, interval)
+    response = jsonify({'interval': interval, 'days': days, 'items': items})
+    response.add_etag()
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+#Laporan
+@route('/laporan')
+@read_replica
+def laporan():
+    owner_id = current_owner_id()
+    if not owner_id:
+        return redirect(url_for('login'))
 
-        if monthly_profit > monthly_profit_last_month:
-            monthly_profit_increase = f"+{monthly_profit_increase}"
-        elif monthly_profit < monthly_profit_last_month:
-            monthly_profit_increase = f"{monthly_profit_increase}"
-        
-        return render_template('beranda.html', nama_toko=nama_toko,
-                           daily_sales=daily_sales, daily_increase=daily_increase,
-                           monthly_sales=monthly_sales, monthly_increase=monthly_increase,
-                           daily_purchases=daily_purchases, daily_purchases_increase=daily_purchases_increase,
-                           monthly_purchases=monthly_purchases, monthly_purchases_increase=monthly_purchases_increase,
-                           daily_profit=daily_profit, daily_profit_increase=daily_profit_increase,
-                           monthly_profit=monthly_profit, monthly_profit_increase=monthly_profit_increase)
-    return redirect(url_for('login'))
+    today = datetime.today().date()
+    bulan = request.args.get('bulan', '')
+    start, end = month_bounds(today)
+    try:
+        if request.args.get('from') and request.args.get('to'):
+            start, end = parse_tanggal(request.args['from']), parse_tanggal(request.args['to'])
+            bulan = ''
+        elif bulan:
+            start, end = month_bounds(datetime.strptime(bulan, '%Y-%m').date())
+    except ValueError:
+        flash('Format tanggal tidak valid.', 'danger')
+    if start > end:
+        start, end = end, start
+
+    report = get_laporan(owner_id, start, end, today)
+    return render_template('laporan/laporan.html', start=start, end=end, bulan=bulan or f'{start:%Y-%m}', **report)
 
 #Transaksi Penjualan
-@app.route('/transaksi-list-penjualan')
+@route('/transaksi-list-penjualan')
+@read_replica
 def transaksi_list():
-    if 'user_id' in session:
-        user_id = session.get('user_id')
-        role = session.get('role')
-        user = User.query.get(user_id)
-        if role == 'pemilik':
-            transaksis = TransaksiPenjualan.query.filter_by(user_id=user.id).all()
-        else:
-            karyawan = Karyawan.query.filter_by(id=user.id).first()
-            transaksis = TransaksiPenjualan.query.filter_by(user_id=karyawan.owner_id).all()
-    return render_template('transaksi_penjualan/transaksi.html', transaksis=transaksis)
-
-@app.route('/transaksi_baru', methods=['GET', 'POST'])
+    owner_id = current_owner_id()
+    if not owner_id:
+        return redirect(url_for('login'))
+    transaksis, next_cursor, filters = transaksi_page(TransaksiPenjualan, owner_id)
+    karyawans = Karyawan.query.filter_by(owner_id=owner_id).all()
+    return render_template('transaksi_penjualan/transaksi.html', transaksis=transaksis, next_cursor=next_cursor,
+                           filters=filters, karyawans=karyawans)
+
+@route('/transaksi-list-penjualan/json')
+@read_replica
+def transaksi_list_json():
+    owner_id = current_owner_id()
+    if not owner_id:
+        return jsonify({'items': [], 'next_cursor': None}), 403
+    transaksis, next_cursor, _ = transaksi_page(TransaksiPenjualan, owner_id)
+    return transaksi_json(transaksis, next_cursor, 'transaksi_detail')
+
+@route('/transaksi-list-penjualan/export')
+@read_replica
+def transaksi_list_export():
+    return export_transaksi(TransaksiPenjualan, DetailTransaksiPenjualan, 'penjualan')
+
+@route('/transaksi_baru', methods=['GET', 'POST'])
 def transaksi_baru():
     if request.method == 'POST':
         user_id = session.get('user_id')
@@ -281,59 +477,45 @@ def transaksi_baru():
             flash('User tidak ditemukan. Silakan login ulang.', 'danger')
             return redirect(url_for('login'))
 
-        if role == 'pemilik':
-            user = User.query.get(user_id)
-            if not user:
-                flash('User tidak valid.', 'danger')
-                return redirect(url_for('login'))
-        elif role == 'karyawan':
-            karyawan = Karyawan.query.get(user_id)
-            if not karyawan:
-                flash('Karyawan tidak valid.', 'danger')
-                return redirect(url_for('login'))
-            user_id = karyawan.owner_id
-        else:
+        if role not in ('pemilik', 'karyawan'):
             flash('Anda tidak memiliki hak akses untuk menambahkan transaksi.', 'danger')
             return redirect(url_for('transaksi_list'))
+        if not current_principal():
+            flash('User tidak valid.' if role == 'pemilik' else 'Karyawan tidak valid.', 'danger')
+            return redirect(url_for('login'))
+        user_id = current_owner_id()
 
         try:
+            tanggal = parse_tanggal(tanggal)
+            cart = parse_cart()
+            products = load_cart_products(user_id, cart)
+
             transaksi = TransaksiPenjualan(user_id=user_id, karyawan_id=karyawan_id, total_harga=total_amount, tanggal=tanggal)
             db.session.add(transaksi)
             db.session.flush()
 
             # Process products
-            products = request.form.getlist('products[][product_id]')
-            quantities = request.form.getlist('products[][quantity]')
-
             details = []
-            for i in range(len(products)):
-                product_id = products[i]
-                quantity = quantities[i]
-
-                if not product_id or not quantity:
-                    continue
-
-                product_id = int(product_id)
-                quantity = int(quantity)
-                product_obj = Product.query.get(product_id)
-                if not product_obj:
-                    raise ValueError(f'Produk dengan ID {product_id} tidak ditemukan.')
-                if product_obj.stock < quantity:
-                    raise ValueError(f'Stok produk {product_obj.name} tidak mencukupi.')
-
+            stock_changes = {}
+            total_quantity = 0
+            for product_id, quantity in cart:
+                product_obj = products[product_id]
                 subtotal = product_obj.price * quantity
                 total_amount += subtotal
+                total_quantity += quantity
 
-                detail = DetailTransaksiPenjualan(transaksi_id=transaksi.id, product_id=product_id, jumlah=quantity, subtotal=subtotal)
-                details.append(detail)
-                product_obj.stock -= quantity
-                db.session.add(product_obj)
+                details.append({'transaksi_id': transaksi.id, 'product_id': product_id, 'jumlah': quantity, 'subtotal': subtotal})
+                stock_changes[product_id] = stock_changes.get(product_id, 0) - quantity
 
-            for detail in details:
-                db.session.add(detail)
+            apply_stock_changes(stock_changes, products)
+            if details:
+                db.session.execute(insert(DetailTransaksiPenjualan), details)
 
             transaksi.total_harga = total_amount
+            apply_rollup(user_id, tanggal, total_penjualan=total_amount, jumlah_penjualan=1, barang_terjual=total_quantity)
             db.session.commit()
+            invalidate_dashboard(user_id)
+            product_index.refresh(user_id, products)
 
             flash('Transaksi berhasil ditambahkan!', 'success')
             return redirect(url_for('transaksi_list'))
@@ -343,27 +525,24 @@ def transaksi_baru():
             flash(f'Error: {str(e)}', 'danger')
             return redirect(url_for('transaksi_baru'))
 
-    products = Product.query.all()
-    return render_template('transaksi_penjualan/transaksi_baru.html', products=products)
+    # Produk diambil lewat /product_search saat kasir mengetik
+    return render_template('transaksi_penjualan/transaksi_baru.html')
 
-@app.route('/transaksi-penjualan/<int:transaksi_id>', methods=['GET', 'POST'])
+@route('/transaksi-penjualan/<int:transaksi_id>', methods=['GET', 'POST'])
 def transaksi_detail(transaksi_id):
-    transaksi = TransaksiPenjualan.query.get_or_404(transaksi_id)
-    products = Product.query.all()
+    # Detail beserta produknya dimuat sekaligus, bukan satu query per baris
+    transaksi = TransaksiPenjualan.query.options(
+        selectinload(TransaksiPenjualan.details_penjualan).joinedload(DetailTransaksiPenjualan.product)
+    ).filter_by(id=transaksi_id).first_or_404()
     details = transaksi.details_penjualan
-    return render_template('transaksi_penjualan/detail_transaksi.html', transaksi=transaksi, details=details, products=products)
+    return render_template('transaksi_penjualan/detail_transaksi.html', transaksi=transaksi, details=details)
 
-@app.route('/transaksi-penjualan/edit/<int:detail_id>', methods=['GET', 'POST'])
+@route('/transaksi-penjualan/edit/<int:detail_id>', methods=['GET', 'POST'])
 def edit_detail(detail_id):
     detail = DetailTransaksiPenjualan.query.get_or_404(detail_id)
     transaksi = TransaksiPenjualan.query.get(detail.transaksi_id)
     user_id = session.get('user_id') or session.get('owner_id')
-    user = None
-    
-    if session.get('role') == 'pemilik':
-        user = User.query.get(user_id)
-    elif session.get('role') == 'karyawan':
-        user = Karyawan.query.get(user_id)
+    user = current_principal()
 
     if not user:
         flash('User tidak valid.', 'danger')
@@ -382,10 +561,16 @@ def edit_detail(detail_id):
             jumlah_diff = original_jumlah -new_jumlah
             detail.jumlah = new_jumlah
             detail.subtotal = product.price * new_jumlah
-            product.stock += jumlah_diff
+            apply_stock_changes({product.id: jumlah_diff}, {product.id: product})
             transaksi.total_harga -= (jumlah_diff * product.price)
+            owner_id = transaksi.user_id
+            product_id = product.id
+            apply_rollup(owner_id, transaksi.tanggal,
+                         total_penjualan=-(jumlah_diff * product.price), barang_terjual=-jumlah_diff)
 
             db.session.commit()
+            invalidate_dashboard(owner_id)
+            product_index.refresh(owner_id, [product_id])
 
             flash('Detail transaksi berhasil diperbarui!', 'success')
             return redirect(url_for('transaksi_detail', transaksi_id=detail.transaksi_id))
@@ -397,17 +582,12 @@ def edit_detail(detail_id):
 
     return render_template('transaksi_penjualan/edit_detail_transaksi.html', detail=detail, product=product)
 
-@app.route('/transaksi-penjualan/delete_detail/<int:detail_id>', methods=['POST'])
+@route('/transaksi-penjualan/delete_detail/<int:detail_id>', methods=['POST'])
 def delete_detail(detail_id):
     detail = DetailTransaksiPenjualan.query.get_or_404(detail_id)
     transaksi = TransaksiPenjualan.query.get(detail.transaksi_id)
     user_id = session.get('user_id') or session.get('owner_id')
-    user = None
-
-    if session.get('role') == 'pemilik':
-        user = User.query.get(user_id)
-    elif session.get('role') == 'karyawan':
-        user = Karyawan.query.get(user_id)
+    user = current_principal()
 
     if not user:
         flash('User tidak valid.', 'danger')
@@ -419,11 +599,16 @@ def delete_detail(detail_id):
 
     try:
         product = Product.query.get(detail.product_id)
-        product.stock += detail.jumlah
+        apply_stock_changes({product.id: detail.jumlah}, {product.id: product})
         transaksi.total_harga -= detail.subtotal
+        owner_id = transaksi.user_id
+        product_id = product.id
+        apply_rollup(owner_id, transaksi.tanggal, total_penjualan=-detail.subtotal, barang_terjual=-detail.jumlah)
 
         db.session.delete(detail)
         db.session.commit()
+        invalidate_dashboard(owner_id)
+        product_index.refresh(owner_id, [product_id])
 
         flash('Detail transaksi berhasil dihapus!', 'success')
         return redirect(url_for('transaksi_detail', transaksi_id=detail.transaksi_id))
@@ -433,16 +618,11 @@ def delete_detail(detail_id):
         flash(f'Error: {str(e)}', 'danger')
         return redirect(url_for('transaksi_detail', transaksi_id=detail.transaksi_id))
 
-@app.route('/transaksi-penjualan/delete/<int:transaksi_id>', methods=['POST'])
+@route('/transaksi-penjualan/delete/<int:transaksi_id>', methods=['POST'])
 def delete_transaksi(transaksi_id):
     transaksi = TransaksiPenjualan.query.get_or_404(transaksi_id)
     user_id = session.get('user_id') or session.get('owner_id')
-    user = None
-
-    if session.get('role') == 'pemilik':
-        user = User.query.get(user_id)
-    elif session.get('role') == 'karyawan':
-        user = Karyawan.query.get(user_id)
+    user = current_principal()
 
     if not user:
         flash('User tidak valid.', 'danger')
@@ -455,13 +635,11 @@ def delete_transaksi(transaksi_id):
 
     try:
         # Return product stock to the original amount
-        for detail in transaksi.details_penjualan:
-            product = Product.query.get(detail.product_id)
-            product.stock += detail.jumlah
-            db.session.delete(detail)
-        
-        db.session.delete(transaksi)
+        owner_id = transaksi.user_id
+        product_ids = hapus_transaksi(TransaksiPenjualan, DetailTransaksiPenjualan, [transaksi])
         db.session.commit()
+        invalidate_dashboard(owner_id)
+        product_index.refresh(owner_id, product_ids)
 
         flash('Transaksi berhasil dihapus!', 'success')
     except Exception as e:
@@ -470,21 +648,59 @@ def delete_transaksi(transaksi_id):
 
     return redirect(url_for('transaksi_list'))
 
+@route('/transaksi-penjualan/delete-terpilih', methods=['POST'])
+def delete_transaksi_terpilih():
+    owner_id = current_owner_id()
+    if not owner_id:
+        flash('User tidak valid.', 'danger')
+        return redirect(url_for('login'))
+
+    transaksis = load_transaksi_terpilih(TransaksiPenjualan, owner_id)
+    if transaksis is None:
+        flash('Anda tidak memiliki hak akses untuk menghapus sebagian transaksi yang dipilih.', 'danger')
+        return redirect(url_for('transaksi_list'))
+
+    if transaksis:
+        try:
+            product_ids = hapus_transaksi(TransaksiPenjualan, DetailTransaksiPenjualan, transaksis)
+            db.session.commit()
+            invalidate_dashboard(owner_id)
+            product_index.refresh(owner_id, product_ids)
+
+            flash(f'{len(transaksis)} transaksi berhasil dihapus!', 'success')
+        except Exception as e:
+            db.session.rollback()
+            flash(str(e), 'danger')
+
+    return redirect(url_for('transaksi_list'))
+
 #Transaksi Pembelian
-@app.route('/transaksi_list-pembelian')
+@route('/transaksi_list-pembelian')
+@read_replica
 def transaksi_list_pembelian():
-    if 'user_id' in session:
-        user_id = session.get('user_id')
-        role = session.get('role')
-        user = User.query.get(user_id)
-        if role == 'pemilik':
-            transaksis = TransaksiPembelian.query.filter_by(user_id=user.id).all()
-        else:
-            karyawan = Karyawan.query.filter_by(id=user.id).first()
-            transaksis = TransaksiPembelian.query.filter_by(user_id=karyawan.owner_id).all()
-    return render_template('transaksi_pembelian/transaksi.html', transaksis=transaksis)
-
-@app.route('/transaksi-pembelian_baru', methods=['GET', 'POST'])
+    owner_id = current_owner_id()
+    if not owner_id:
+        return redirect(url_for('login'))
+    transaksis, next_cursor, filters = transaksi_page(TransaksiPembelian, owner_id)
+    karyawans = Karyawan.query.filter_by(owner_id=owner_id).all()
+    return render_template('transaksi_pembelian/transaksi.html', transaksis=transaksis, next_cursor=next_cursor,
+                           filters=filters, karyawans=karyawans)
+
+@route('/transaksi_list-pembelian/json')
+@read_replica
+def transaksi_list_pembelian_json():
+    owner_id = current_owner_id()
+    if not owner_id:
+        return jsonify({'items': [], 'next_cursor': None}), 403
+    transaksis, next_cursor, _ = transaksi_page(TransaksiPembelian, owner_id)
+    return transaksi_json(transaksis, next_cursor, 'transaksi_detail_pembelian')
+
+@route('/transaksi_list-pembelian/export')
+@read_replica
+def transaksi_list_pembelian_export():
+    return export_transaksi(TransaksiPembelian, DetailTransaksiPembelian, 'pembelian')
+
+@route('/transaksi-pembelian_baru', methods=['GET', 'POST'])
 def transaksi_pembelian_baru():
     if request.method == 'POST':
         user_id = session.get('user_id')
@@ -497,57 +713,43 @@ def transaksi_pembelian_baru():
             flash('User tidak ditemukan. Silakan login ulang.', 'danger')
             return redirect(url_for('login'))
 
-        if role == 'pemilik':
-            user = User.query.get(user_id)
-            if not user:
-                flash('User tidak valid.', 'danger')
-                return redirect(url_for('login'))
-        elif role == 'karyawan':
-            karyawan = Karyawan.query.get(user_id)
-            if not karyawan:
-                flash('Karyawan tidak valid.', 'danger')
-                return redirect(url_for('login'))
-            user_id = karyawan.owner_id
-        else:
+        if role not in ('pemilik', 'karyawan'):
             flash('Anda tidak memiliki hak akses untuk menambahkan transaksi.', 'danger')
             return redirect(url_for('transaksi_list_pembelian'))
+        if not current_principal():
+            flash('User tidak valid.' if role == 'pemilik' else 'Karyawan tidak valid.', 'danger')
+            return redirect(url_for('login'))
+        user_id = current_owner_id()
 
         try:
+            tanggal = parse_tanggal(tanggal)
+            cart = parse_cart()
+            products = load_cart_products(user_id, cart)
+
             transaksi = TransaksiPembelian(user_id=user_id, karyawan_id=karyawan_id, total_harga=total_amount, tanggal=tanggal)
             db.session.add(transaksi)
             db.session.flush()
 
             # Process products
-            products = request.form.getlist('products[][product_id]')
-            quantities = request.form.getlist('products[][quantity]')
-
             details = []
-            for i in range(len(products)):
-                product_id = products[i]
-                quantity = quantities[i]
-
-                if not product_id or not quantity:
-                    continue
-
-                product_id = int(product_id)
-                quantity = int(quantity)
-                product_obj = Product.query.get(product_id)
-                if not product_obj:
-                    raise ValueError(f'Produk dengan ID {product_id} tidak ditemukan.')
-
+            stock_changes = {}
+            for product_id, quantity in cart:
+                product_obj = products[product_id]
                 subtotal = product_obj.harga_beli * quantity
                 total_amount += subtotal
 
-                detail = DetailTransaksiPembelian(transaksi_id=transaksi.id, product_id=product_id, jumlah=quantity, subtotal=subtotal)
-                details.append(detail)
-                product_obj.stock += quantity
-                db.session.add(product_obj)
+                details.append({'transaksi_id': transaksi.id, 'product_id': product_id, 'jumlah': quantity, 'subtotal': subtotal})
+                stock_changes[product_id] = stock_changes.get(product_id, 0) + quantity
 
-            for detail in details:
-                db.session.add(detail)
+            apply_stock_changes(stock_changes, products)
+            if details:
+                db.session.execute(insert(DetailTransaksiPembelian), details)
 
             transaksi.total_harga = total_amount
+            apply_rollup(user_id, tanggal, total_pembelian=total_amount, jumlah_pembelian=1)
             db.session.commit()
+            invalidate_dashboard(user_id)
+            product_index.refresh(user_id, products)
 
             flash('Transaksi berhasil ditambahkan!', 'success')
             return redirect(url_for('transaksi_list_pembelian'))
@@ -557,27 +759,24 @@ def transaksi_pembelian_baru():
             flash(f'Error: {str(e)}', 'danger')
             return redirect(url_for('transaksi_baru'))
 
-    products = Product.query.all()
-    return render_template('transaksi_pembelian/transaksi_baru.html', products=products)
+    # Produk diambil lewat /product_search saat kasir mengetik
+    return render_template('transaksi_pembelian/transaksi_baru.html')
 
-@app.route('/transaksi-pembelian/<int:transaksi_id>', methods=['GET', 'POST'])
+@route('/transaksi-pembelian/<int:transaksi_id>', methods=['GET', 'POST'])
 def transaksi_detail_pembelian(transaksi_id):
-    transaksi = TransaksiPembelian.query.get_or_404(transaksi_id)
-    products = Product.query.all()
+    # Detail beserta produknya dimuat sekaligus, bukan satu query per baris
+    transaksi = TransaksiPembelian.query.options(
+        selectinload(TransaksiPembelian.details_pembelian).joinedload(DetailTransaksiPembelian.product)
+    ).filter_by(id=transaksi_id).first_or_404()
     details = transaksi.details_pembelian
-    return render_template('transaksi_pembelian/detail_transaksi.html', transaksi=transaksi, details=details, products=products)
+    return render_template('transaksi_pembelian/detail_transaksi.html', transaksi=transaksi, details=details)
 
-@app.route('/transaksi-pembelian/edit/<int:detail_id>', methods=['GET', 'POST'])
+@route('/transaksi-pembelian/edit/<int:detail_id>', methods=['GET', 'POST'])
 def edit_detail_pembelian(detail_id):
     detail = DetailTransaksiPembelian.query.get_or_404(detail_id)
     transaksi = TransaksiPembelian.query.get(detail.transaksi_id)
     user_id = session.get('user_id') or session.get('owner_id')
-    user = None
-    
-    if session.get('role') == 'pemilik':
-        user = User.query.get(user_id)
-    elif session.get('role') == 'karyawan':
-        user = Karyawan.query.get(user_id)
+    user = current_principal()
 
     if not user:
         flash('User tidak valid.', 'danger')
@@ -596,10 +795,15 @@ def edit_detail_pembelian(detail_id):
             jumlah_diff = original_jumlah -new_jumlah
             detail.jumlah = new_jumlah
             detail.subtotal = product.harga_beli * new_jumlah
-            product.stock -= jumlah_diff
+            apply_stock_changes({product.id: -jumlah_diff}, {product.id: product})
             transaksi.total_harga -= (jumlah_diff * product.harga_beli)
+            owner_id = transaksi.user_id
+            product_id = product.id
+            apply_rollup(owner_id, transaksi.tanggal, total_pembelian=-(jumlah_diff * product.harga_beli))
 
             db.session.commit()
+            invalidate_dashboard(owner_id)
+            product_index.refresh(owner_id, [product_id])
 
             flash('Detail transaksi berhasil diperbarui!', 'success')
             return redirect(url_for('transaksi_detail_pembelian', transaksi_id=detail.transaksi_id))
@@ -611,17 +815,12 @@ def edit_detail_pembelian(detail_id):
 
     return render_template('transaksi_pembelian/edit_detail_transaksi.html', detail=detail, product=product)
     
-@app.route('/transaksi-pembelian/delete_detail/<int:detail_id>', methods=['POST'])
+@route('/transaksi-pembelian/delete_detail/<int:detail_id>', methods=['POST'])
 def delete_detail_pembelian(detail_id):
     detail = DetailTransaksiPembelian.query.get_or_404(detail_id)
     transaksi = TransaksiPembelian.query.get(detail.transaksi_id)
     user_id = session.get('user_id') or session.get('owner_id')
-    user = None
-
-    if session.get('role') == 'pemilik':
-        user = User.query.get(user_id)
-    elif session.get('role') == 'karyawan':
-        user = Karyawan.query.get(user_id)
+    user = current_principal()
 
     if not user:
         flash('User tidak valid.', 'danger')
@@ -633,11 +832,16 @@ def delete_detail_pembelian(detail_id):
 
     try:
         product = Product.query.get(detail.product_id)
-        product.stock -= detail.jumlah
+        apply_stock_changes({product.id: -detail.jumlah}, {product.id: product})
         transaksi.total_harga -= detail.subtotal
+        owner_id = transaksi.user_id
+        product_id = product.id
+        apply_rollup(owner_id, transaksi.tanggal, total_pembelian=-detail.subtotal)
 
         db.session.delete(detail)
         db.session.commit()
+        invalidate_dashboard(owner_id)
+        product_index.refresh(owner_id, [product_id])
 
         flash('Detail transaksi berhasil dihapus!', 'success')
         return redirect(url_for('transaksi_detail_pembelian', transaksi_id=detail.transaksi_id))
@@ -647,16 +851,11 @@ def delete_detail_pembelian(detail_id):
         flash(f'Error: {str(e)}', 'danger')
         return redirect(url_for('transaksi_detail_pembelian', transaksi_id=detail.transaksi_id))
 
-@app.route('/transaksi-pembelian/delete/<int:transaksi_id>', methods=['POST'])
+@route('/transaksi-pembelian/delete/<int:transaksi_id>', methods=['POST'])
 def delete_transaksi_pembelian(transaksi_id):
     transaksi = TransaksiPembelian.query.get_or_404(transaksi_id)
     user_id = session.get('user_id') or session.get('owner_id')
-    user = None
-
-    if session.get('role') == 'pemilik':
-        user = User.query.get(user_id)
-    elif session.get('role') == 'karyawan':
-        user = Karyawan.query.get(user_id)
+    user = current_principal()
 
     if not user:
         flash('User tidak valid.', 'danger')
@@ -667,14 +866,11 @@ def delete_transaksi_pembelian(transaksi_id):
         return redirect(url_for('transaksi_list_pembelian'))
 
     try:
-        for detail in transaksi.details_pembelian:
-            product = Product.query.get(detail.product_id)
-            if product:
-                product.stock -= detail.jumlah
-                db.session.delete(detail)
-        
-        db.session.delete(transaksi)
+        owner_id = transaksi.user_id
+        product_ids = hapus_transaksi(TransaksiPembelian, DetailTransaksiPembelian, [transaksi])
         db.session.commit()
+        invalidate_dashboard(owner_id)
+        product_index.refresh(owner_id, product_ids)
 
         flash('Transaksi berhasil dihapus!', 'success')
     except Exception as e:
@@ -683,65 +879,68 @@ def delete_transaksi_pembelian(transaksi_id):
 
     return redirect(url_for('transaksi_list_pembelian'))
 
+@route('/transaksi-pembelian/delete-terpilih', methods=['POST'])
+def delete_transaksi_pembelian_terpilih():
+    owner_id = current_owner_id()
+    if not owner_id:
+        flash('User tidak valid.', 'danger')
+        return redirect(url_for('login'))
+
+    transaksis = load_transaksi_terpilih(TransaksiPembelian, owner_id)
+    if transaksis is None:
+        flash('Anda tidak memiliki hak akses untuk menghapus sebagian transaksi yang dipilih.', 'danger')
+        return redirect(url_for('transaksi_list_pembelian'))
+
+    if transaksis:
+        try:
+            product_ids = hapus_transaksi(TransaksiPembelian, DetailTransaksiPembelian, transaksis)
+            db.session.commit()
+            invalidate_dashboard(owner_id)
+            product_index.refresh(owner_id, product_ids)
+
+            flash(f'{len(transaksis)} transaksi berhasil dihapus!', 'success')
+        except Exception as e:
+            db.session.rollback()
+            flash(f'Error: {str(e)}', 'danger')
+
+    return redirect(url_for('transaksi_list_pembelian'))
+
 #Produk
-@app.route('/product_search', methods=['GET'])
+@route('/product_search', methods=['GET'])
 def product_search():
     query = request.args.get('q', '')
     if 'user_id' not in session:
         return jsonify([]), 403  # Return an empty list and forbidden status if user is not logged in
 
-    user_id = session.get('user_id')
-    role = session.get('role')
-    
-    if role == 'pemilik':
-        user = User.query.get(user_id)
-        if user:
-            products = Product.query.filter(Product.name.ilike(f'%{query}%'), Product.user_id == user.id).all()
-        else:
-            return jsonify([]), 404  # User not found
-    else:
-        karyawan = Karyawan.query.filter_by(id=user_id).first()
-        if karyawan:
-            products = Product.query.filter(Product.name.ilike(f'%{query}%'), Product.user_id == karyawan.owner_id).all()
-        else:
-            return jsonify([]), 404  # Karyawan not found
+    owner_id = current_owner_id()
+    if not owner_id:
+        return jsonify([]), 404  # User/Karyawan not found
 
-    results = [
-        {'id': product.id, 'name': product.name, 'stock': product.stock}
-        for product in products
-    ]
+    limit = min(request.args.get('limit', current_app.config['PRODUCT_SEARCH_LIMIT'], type=int), 50)
+    results = product_index.search(owner_id, query, max(limit, 1))
     return jsonify(results)
 
-@app.route("/produk")
+@route("/produk")
+@read_replica
 def produk():
-    if 'user_id' in session:
-        user_id = session.get('user_id')
-        role = session.get('role')
-        user = User.query.get(user_id)
-        if role == 'pemilik':
-            products = Product.query.filter_by(user_id=user.id).all()
-        else:
-            karyawan = Karyawan.query.filter_by(id=user.id).first()
-            products = Product.query.filter_by(user_id=karyawan.owner_id).all()
+    owner_id = current_owner_id()
+    if not owner_id:
+        return redirect(url_for('login'))
+    products = Product.query.filter_by(user_id=owner_id).all()
     # products = Product.query.all()
     return render_template('produk/produk.html', products=products)
 
-@app.route('/product/<int:product_id>')
+@route('/product/<int:product_id>')
 def product_detail(product_id):
     product = Product.query.get_or_404(product_id)
     return render_template('produk/detail_produk.html', product=product)
 
-@app.route('/product/<int:product_id>/edit', methods=['GET', 'POST'])
+@route('/product/<int:product_id>/edit', methods=['GET', 'POST'])
 def edit_product(product_id):
     product = Product.query.get_or_404(product_id)
 
     user_id = session.get('user_id') or session.get('owner_id')
-    user = None
-
-    if session.get('role') == 'pemilik':
-        user = User.query.get(user_id)
-    elif session.get('role') == 'karyawan':
-        user = Karyawan.query.get(user_id)
+    user = current_principal()
 
     if not user:
         flash('User tidak valid.', 'danger')
@@ -758,11 +957,12 @@ def edit_product(product_id):
             if 'image' in request.files:
                 image_file = request.files['image']
                 if image_file.filename != '':
-                    image_filename = secure_filename(image_file.filename)
-                    image_file.save(os.path.join('static/product_images', image_filename))
+                    image_filename = save_image(image_file, current_app.config['PRODUCT_IMAGE_FOLDER'], PRODUCT_SIZES)
                     product.image = image_filename
 
+            owner_id = product.user_id
             db.session.commit()
+            product_index.refresh(owner_id, [product_id])
             flash('Product updated successfully!', 'success')
             return redirect(url_for('product_detail', product_id=product.id))
         
@@ -773,7 +973,7 @@ def edit_product(product_id):
 
     return render_template('produk/edit_produk.html', product=product)
 
-@app.route('/product/new', methods=['GET', 'POST'])
+@route('/product/new', methods=['GET', 'POST'])
 def new_product():
     if 'role' in session:
         if request.method == 'POST':
@@ -783,53 +983,75 @@ def new_product():
             price = float(request.form['price'])
             category = request.form['category']
             image_file = request.files['image']
-            image_filename = secure_filename(image_file.filename)
-            image_file.save(os.path.join('static/product_images', image_filename))
+            try:
+                image_filename = save_image(image_file, current_app.config['PRODUCT_IMAGE_FOLDER'], PRODUCT_SIZES)
+            except ValueError as e:
+                flash(str(e), 'danger')
+                return redirect(url_for('new_product'))
 
             new_product = Product(name=name, description=description, harga_beli=harga_beli, price=price, category=category, image=image_filename, user_id=session['user_id'])
             db.session.add(new_product)
             db.session.commit()
+            product_index.refresh(new_product.user_id, [new_product.id])
             flash('Product added successfully!', 'success')
             return redirect(url_for('produk'))
 
     return render_template('produk/produk_baru.html')
 
-@app.route('/product/delete/<int:product_id>', methods=['GET', 'POST'])
+@route('/product/import', methods=['GET', 'POST'])
+def import_product():
+    owner_id = current_owner_id()
+    if not owner_id:
+        return redirect(url_for('login'))
+
+    result = None
+    if request.method == 'POST':
+        request.max_content_length = current_app.config['IMPORT_MAX_BYTES']
+        request.max_file_size = current_app.config['IMPORT_MAX_BYTES']
+        csv_file = request.files.get('file')
+        if not csv_file or csv_file.filename == '':
+            flash('Pilih file CSV terlebih dahulu.', 'danger')
+            return redirect(url_for('import_product'))
+
+        # Upload besar sudah ditampung werkzeug di file sementara; dibaca per baris dari sana
+        stream = io.TextIOWrapper(csv_file.stream, encoding='utf-8-sig', newline='')
+        try:
+            result = import_products(owner_id, stream, current_app.config['IMPORT_BATCH_SIZE'])
+        except (ValueError, UnicodeDecodeError) as e:
+            flash(f'File tidak bisa dibaca: {e}', 'danger')
+            return redirect(url_for('import_product'))
+        product_index.forget(owner_id)
+
+    return render_template('produk/import_produk.html', result=result)
+
+@route('/product/delete/<int:product_id>', methods=['GET', 'POST'])
 def delete_product(product_id):
     if request.method == 'POST':
         product = Product.query.get_or_404(product_id)
+        owner_id = product.user_id
         db.session.delete(product)
         db.session.commit()
+        product_index.remove(owner_id, product_id)
         flash('Product deleted successfully!', 'success')
     return redirect(url_for('produk'))
 
-@app.route('/search')
+@route('/search')
+@read_replica
 def search_product():
     # query = request.args.get('query')
     # products = Product.query.filter(Product.name.like(f'%{query}%')).all()
     query = request.args.get('query', '')
+    page = max(request.args.get('page', 1, type=int), 1)
     products = []
+    has_next = False
 
-    if 'user_id' in session:
-        user_id = session.get('user_id')
-        role = session.get('role')
-        user = User.query.get(user_id)
-
-        if role == 'pemilik':
-            products = Product.query.filter(
-                Product.user_id == user.id,
-                Product.name.like(f'%{query}%')
-            ).all()
-        else:
-            karyawan = Karyawan.query.filter_by(id=user.id).first()
-            products = Product.query.filter(
-                Product.user_id == karyawan.owner_id,
-                Product.name.like(f'%{query}%')
-            ).all()
-    return render_template('produk/produk.html', products=products)
+    owner_id = current_owner_id()
+    if owner_id:
+        products, has_next = search_products(owner_id, query, page, current_app.config['SEARCH_PER_PAGE'])
+    return render_template('produk/produk.html', products=products, query=query, page=page, has_next=has_next)
 
 #Pengaturan
-@app.route('/pengaturan')
+@route('/pengaturan')
 def pengaturan():
     user_id = session.get('user_id')
     if 'role' in session:
@@ -850,7 +1072,7 @@ def pengaturan():
     # Additional logic for settings page
     return render_template('pengaturan/pengaturan.html', user=user)
 
-@app.route('/ubah-password', methods=['GET', 'POST'])
+@route('/ubah-password', methods=['GET', 'POST'])
 def ubah_password():
     user_id = session.get('user_id')
     if user_id is None:
@@ -869,18 +1091,18 @@ def ubah_password():
         new_password = request.form['new_password']
         confirm_password = request.form['confirm_password']
 
-        if not check_password_hash(user.password, current_password):
+        if not passwords.check(user.password, current_password):
             flash('Password saat ini salah!', 'danger')
         elif new_password != confirm_password:
             flash('Password baru tidak cocok!', 'danger')
         else:
-            user.password = generate_password_hash(new_password)
+            user.password = passwords.hash(new_password)
             db.session.commit()
             return redirect(url_for('pengaturan'))
 
     return render_template('pengaturan/ubah_password.html', user=user)
 
-@app.route('/profile/<int:user_id>')
+@route('/profile/<int:user_id>')
 def profile(user_id):
     user_id = session.get('user_id')
     if 'role' in session:
@@ -893,7 +1115,7 @@ def profile(user_id):
 
     return render_template('pengaturan/profile.html', user=user)
 
-@app.route('/profile/edit/<int:user_id>', methods=['GET', 'POST'])
+@route('/profile/edit/<int:user_id>', methods=['GET', 'POST'])
 def edit_profile(user_id):
     user_id = session.get('user_id')
     if 'role' in session:
@@ -908,10 +1130,14 @@ def edit_profile(user_id):
                 if 'profile_pic' in request.files:
                     image_file = request.files['profile_pic']
                     if image_file.filename != '':
-                        image_filename = secure_filename(image_file.filename)
-                        image_file.save(os.path.join(app.config['FOLDER_PROFILE_P'], image_filename))
+                        try:
+                            image_filename = save_image(image_file, current_app.config['FOLDER_PROFILE_P'], PROFILE_SIZES)
+                        except ValueError as e:
+                            flash(str(e), 'danger')
+                            return redirect(url_for('edit_profile', user_id=user.id))
                         user.profile_pic = image_filename
                 db.session.commit()
+                forget_principal('pemilik', user.id)
                 flash('Profil diperbarui!', 'success')
                 return redirect(url_for('profile', user_id=user.id))
         else:
@@ -924,10 +1150,14 @@ def edit_profile(user_id):
                 if 'profile_pic' in request.files:
                     image_file = request.files['profile_pic']
                     if image_file.filename != '':
-                        image_filename = secure_filename(image_file.filename)
-                        image_file.save(os.path.join(app.config['FOLDER_PROFILE_P'], image_filename))
+                        try:
+                            image_filename = save_image(image_file, current_app.config['FOLDER_PROFILE_P'], PROFILE_SIZES)
+                        except ValueError as e:
+                            flash(str(e), 'danger')
+                            return redirect(url_for('edit_profile', user_id=user.id))
                         user.profile_pic = image_filename
                 db.session.commit()
+                forget_principal('karyawan', user.id)
                 flash('Profil diperbarui!', 'success')
                 return redirect(url_for('profile', user_id=user.id))
     else:
@@ -936,26 +1166,29 @@ def edit_profile(user_id):
     return render_template('pengaturan/edit_profile.html', user=user)
 
 #Karyawan
-@app.route('/daftar-karyawan')
+@route('/daftar-karyawan')
 def daftar_karyawan():
     if 'user_id' not in session or session['role'] != 'pemilik':
         return redirect(url_for('login'))
     karyawan = Karyawan.query.filter_by(owner_id=session['user_id']).all()
     return render_template('karyawan/daftar_karyawan.html', karyawan=karyawan)
 
-@app.route('/tambah-karyawan', methods=['GET', 'POST'])
+@route('/tambah-karyawan', methods=['GET', 'POST'])
 def tambah_karyawan():
     if 'user_id' not in session or session['role'] != 'pemilik':
         return redirect(url_for('login'))
     if request.method == 'POST':
         nama_karyawan = request.form['namaK']
         username = request.form['usernameK']
-        password = generate_password_hash(request.form['passwordK'])
+        password = passwords.hash(request.form['passwordK'])
         email = request.form['emailK']
         phone = request.form['phoneK']
         profile_pic = request.files['profile_pic_k']
-        image_filename = secure_filename(profile_pic.filename)
-        profile_pic.save(os.path.join(app.config['FOLDER_PROFILE_P'], image_filename))
+        try:
+            image_filename = save_image(profile_pic, current_app.config['FOLDER_PROFILE_P'], PROFILE_SIZES)
+        except ValueError as e:
+            flash(str(e), 'danger')
+            return redirect(url_for('tambah_karyawan'))
 
         karyawan_baru = Karyawan(
             nama_karyawan=nama_karyawan,
@@ -971,12 +1204,12 @@ def tambah_karyawan():
         return redirect(url_for('daftar_karyawan'))
     return render_template('karyawan/tambah_karyawan.html')
 
-@app.route('/detail-karyawan/<int:karyawan_id>')
+@route('/detail-karyawan/<int:karyawan_id>')
 def detail_karyawan(karyawan_id):
     karyawan = Karyawan.query.get_or_404(karyawan_id)
     return render_template('karyawan/detail_karyawan.html', karyawan=karyawan)
 
-@app.route('/edit-karyawan/<int:karyawan_id>', methods=['GET', 'POST'])
+@route('/edit-karyawan/<int:karyawan_id>', methods=['GET', 'POST'])
 def edit_karyawan(karyawan_id):
     if 'user_id' not in session or session['role'] != 'pemilik':
         return redirect(url_for('login'))
@@ -990,15 +1223,19 @@ def edit_karyawan(karyawan_id):
         if 'profile_pic_k' in request.files:
             image_file = request.files['profile_pic_k']
             if image_file.filename != '':
-                image_filename = secure_filename(image_file.filename)
-                image_file.save(os.path.join(app.config['FOLDER_PROFILE_P'], image_filename))
+                try:
+                    image_filename = save_image(image_file, current_app.config['FOLDER_PROFILE_P'], PROFILE_SIZES)
+                except ValueError as e:
+                    flash(str(e), 'danger')
+                    return redirect(url_for('edit_karyawan', karyawan_id=karyawan.id))
                 karyawan.profile_pic = image_filename
                 
         db.session.commit()
+        forget_principal('karyawan', karyawan.id)
         return redirect(url_for('detail_karyawan', karyawan_id=karyawan.id))
     return render_template('karyawan/edit_data_karyawan.html', karyawan=karyawan)
 
-@app.route('/hapus-karyawan/<int:karyawan_id>', methods=['GET', 'POST'])
+@route('/hapus-karyawan/<int:karyawan_id>', methods=['GET', 'POST'])
 def hapus_karyawan(karyawan_id):
     if 'user_id' not in session or session['role'] != 'pemilik':
         return redirect(url_for('login'))
@@ -1006,8 +1243,39 @@ def hapus_karyawan(karyawan_id):
         karyawan = Karyawan.query.get_or_404(karyawan_id)
         db.session.delete(karyawan)
         db.session.commit()
+        forget_principal('karyawan', karyawan_id)
     return redirect(url_for('daftar_karyawan'))
 
+def create_app(config=Config):
+    app = Flask(__name__)
+    app.config.from_object(config)
+    db.init_app(app)
+    cache.init_app(app)
+    product_index.init_app(app)
+    image_processor.init_app(app)
+    passwords.init_app(app)
+    login_limiter.init_app(app)
+    assets.init_app(app)
+    metrics.init_app(app)
+    profiler.init_app(app)
+    app.jinja_env.globals['image_url'] = image_url
+    app.jinja_env.globals['image_status'] = image_status
+
+    for rule, view, options in routes:
+        app.add_url_rule(rule, view_func=view, **options)
+    for cmd in commands:
+        app.cli.add_command(cmd)
+    app.register_error_handler(PasswordBusy, server_busy)
+    app.register_error_handler(ImageBusy, server_busy)
+
+    if app.config.get('AUTO_UPGRADE_DB'):
+        with app.app_context():
+            upgrade()
+    return app
+
 if __name__ == '__main__':
+    app = create_app()
+    with app.app_context():
+        upgrade()
     app.run(debug=True)
 
@@ -0,0 +1,109 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+from flask import Response, abort, request, url_for
+
+try:
+    import brotli
+except ImportError:  # Tanpa modul brotli hanya versi gzip yang dibuat
+    brotli = None
+
+ASSET_DIRS = ('css', 'js')
+MAX_AGE = 365 * 24 * 3600
+IMAGE_VARIANT = re.compile(r'(^|/)[0-9a-f]{16}_[a-z]+\.webp$')
+
+
+class Assets:
+    # Saat aplikasi start, CSS/JS diberi hash di nama file dan dikompresi sekali (gzip, brotli).
+    # URL-nya tidak pernah berubah isi, jadi browser boleh menyimpannya selamanya.
+    def __init__(self, app=None):
+        self.manifest = {}
+        self.files = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if not app.config.get('ASSETS_FINGERPRINT', True):
+            return
+        self.build(app.static_folder)
+        app.add_url_rule('/assets/<path:filename>', 'assets', self.serve)
+        app.jinja_env.globals['url_for'] = self.url_for
+        app.jinja_env.globals['asset_url'] = self.asset_url
+        app.after_request(self.cache_images)
+
+    def build(self, static_folder):
+        for folder in ASSET_DIRS:
+            for root, _, filenames in os.walk(os.path.join(static_folder, folder)):
+                for name in filenames:
+                    path = os.path.join(root, name)
+                    filename = os.path.relpath(path, static_folder).replace(os.sep, '/')
+                    with open(path, 'rb') as f:
+                        data = f.read()
+
+                    digest = hashlib.sha256(data).hexdigest()[:10]
+                    stem, ext = os.path.splitext(filename)
+                    hashed = f'{stem}.{digest}{ext}'
+
+                    bodies = {'gzip': gzip.compress(data, 9, mtime=0)}
+                    if brotli is not None:
+                        bodies['br'] = brotli.compress(data, quality=11)
+                    bodies = {encoding: body for encoding, body in bodies.items() if len(body) < len(data)}
+                    bodies['identity'] = data
+
+                    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+                    self.manifest[filename] = hashed
+                    self.files[hashed] = (mimetype, digest, bodies)
+
+    def asset_url(self, filename):
+        hashed = self.manifest.get(filename)
+        if hashed is None:
+            return url_for('static', filename=filename)
+        return url_for('assets', filename=hashed)
+
+    def url_for(self, endpoint, **values):
+        # Pengganti url_for di template: url_for('static', filename=...) untuk CSS/JS diarahkan ke /assets
+        if endpoint == 'static' and set(values) == {'filename'} and values['filename'] in self.manifest:
+            return self.asset_url(values['filename'])
+        return url_for(endpoint, **values)
+
+    def serve(self, filename):
+        entry = self.files.get(filename)
+        if entry is None:
+            abort(404)
+        mimetype, digest, bodies = entry
+
+        encoding = 'identity'
+        for candidate in ('br', 'gzip'):
+            if candidate in bodies and request.accept_encodings[candidate]:
+                encoding = candidate
+                break
+
+        etag = f'{digest}-{encoding}'
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            response = Response(bodies[encoding], mimetype=mimetype)
+            if encoding != 'identity':
+                response.headers['Content-Encoding'] = encoding
+        response.set_etag(etag)
+        response.vary.add('Accept-Encoding')
+        self._cache_forever(response)
+        return response
+
+    def cache_images(self, response):
+        # Gambar turunan dengan nama hash (lihat images.py) juga tidak pernah berubah isi
+        if request.endpoint == 'static' and response.status_code == 200 \
+                and IMAGE_VARIANT.search((request.view_args or {}).get('filename', '')):
+            self._cache_forever(response)
+        return response
+
+    def _cache_forever(self, response):
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = MAX_AGE
+        response.cache_control.immutable = True
+
+
+assets = Assets()
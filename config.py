@@ -1,8 +1,88 @@
 import os
 
+
+def engine_options(url):
+    # Pool koneksi; pre-ping dan recycle mencegah error karena koneksi MySQL diputus server setelah idle
+    options = {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 10)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 20)),
+        'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 30)),
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 280)),
+        'pool_pre_ping': os.environ.get('DB_POOL_PRE_PING', '1') == '1',
+    }
+    if url.startswith('mysql'):
+        options['connect_args'] = {'connect_timeout': int(os.environ.get('DB_CONNECT_TIMEOUT', 10))}
+    return options
+
+
 class Config:
     SECRET_KEY = os.urandom(24)
-    SQLALCHEMY_DATABASE_URI = 'mysql+pymysql://root:@localhost/notisq'
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'mysql+pymysql://root:@localhost/notisq')
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
+    # Replika baca opsional (sebaiknya user read-only) untuk dashboard, daftar, pencarian dan laporan
+    DATABASE_REPLICA_URL = os.environ.get('DATABASE_REPLICA_URL')
+    SQLALCHEMY_BINDS = {'replica': {'url': DATABASE_REPLICA_URL, **engine_options(DATABASE_REPLICA_URL)}} \
+        if DATABASE_REPLICA_URL else {}
+    # Setelah user menulis, request berikutnya tetap membaca primary selama sekian detik (jeda replikasi)
+    REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', 5))
+    # Hasil dashboard yang dibaca dari replika tidak disimpan lebih lama dari ini
+    REPLICA_CACHE_TTL = int(os.environ.get('REPLICA_CACHE_TTL', 60))
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Metode hash password werkzeug, mis. 'scrypt:32768:8:1' atau 'pbkdf2:sha256:600000'.
+    # Hash dengan metode/cost lain diganti otomatis saat user berhasil login.
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+    PASSWORD_HASH_QUEUE = int(os.environ.get('PASSWORD_HASH_QUEUE', 32))
+    PASSWORD_HASH_TIMEOUT = int(os.environ.get('PASSWORD_HASH_TIMEOUT', 5))
+    # Login gagal per username dan per IP dalam LOGIN_WINDOW detik sebelum ditolak tanpa cek password
+    LOGIN_MAX_FAILURES = int(os.environ.get('LOGIN_MAX_FAILURES', 5))
+    LOGIN_MAX_FAILURES_IP = int(os.environ.get('LOGIN_MAX_FAILURES_IP', 30))
+    LOGIN_WINDOW = int(os.environ.get('LOGIN_WINDOW', 300))
+    # Statistik latensi dan query SQL per endpoint di /stats dan /metrics (format Prometheus);
+    # kedua URL hanya bisa dibuka dengan METRICS_TOKEN (header Authorization: Bearer <token>).
+    # Data per proses worker (label pid): scrape setiap worker, atau jalankan dengan satu worker
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '0') == '1'
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+    METRICS_N_PLUS_ONE = int(os.environ.get('METRICS_N_PLUS_ONE', 5))
+    # Profil cProfile + daftar SQL untuk request yang membawa token dari `flask profiler-token`
+    # (header X-Profile-Token atau ?_profile=); hasil disimpan di PROFILER_DIR.
+    # PROFILER_SECRET wajib diisi dan harus sama untuk semua worker dan perintah CLI
+    PROFILER_ENABLED = os.environ.get('PROFILER_ENABLED', '0') == '1'
+    PROFILER_SECRET = os.environ.get('PROFILER_SECRET')
+    PROFILER_DIR = os.environ.get('PROFILER_DIR')
+    PROFILER_TOKEN_MAX_AGE = int(os.environ.get('PROFILER_TOKEN_MAX_AGE', 3600))
+    PROFILER_MAX_FILES = int(os.environ.get('PROFILER_MAX_FILES', 50))
+    PROFILER_MAX_AGE = int(os.environ.get('PROFILER_MAX_AGE', 7 * 24 * 3600))
+    # Jalankan migrasi saat create_app(); untuk produksi lebih baik `flask upgrade-db` sekali saat deploy
+    AUTO_UPGRADE_DB = os.environ.get('AUTO_UPGRADE_DB', '0') == '1'
     UPLOAD_FOLDER = 'static/images'
     FOLDER_PROFILE_P = 'static/profile-pic'
+    PRODUCT_IMAGE_FOLDER = 'static/product_images'
+    # Batas ukuran satu gambar dan seluruh request upload
+    UPLOAD_MAX_BYTES = int(os.environ.get('UPLOAD_MAX_BYTES', 10 * 1024 * 1024))
+    MAX_CONTENT_LENGTH = UPLOAD_MAX_BYTES + 1024 * 1024
+    UPLOAD_TMP_FOLDER = os.environ.get('UPLOAD_TMP_FOLDER')
+    IMAGE_WORKERS = int(os.environ.get('IMAGE_WORKERS', 2))
+    IMAGE_QUEUE_SIZE = int(os.environ.get('IMAGE_QUEUE_SIZE', 16))
+    # Detik menunggu tempat di antrean gambar sebelum upload ditolak dengan 503
+    IMAGE_QUEUE_TIMEOUT = int(os.environ.get('IMAGE_QUEUE_TIMEOUT', 5))
+    # CSS/JS diberi hash di nama file dan dikompresi saat start; set 0 untuk mematikan
+    ASSETS_FINGERPRINT = os.environ.get('ASSETS_FINGERPRINT', '1') == '1'
+    TRANSAKSI_PER_PAGE = int(os.environ.get('TRANSAKSI_PER_PAGE', 50))
+    PRODUCT_SEARCH_LIMIT = int(os.environ.get('PRODUCT_SEARCH_LIMIT', 20))
+    SEARCH_INDEX_MAX_OWNERS = int(os.environ.get('SEARCH_INDEX_MAX_OWNERS', 100))
+    SEARCH_INDEX_TTL = int(os.environ.get('SEARCH_INDEX_TTL', 300))
+    SEARCH_PER_PAGE = int(os.environ.get('SEARCH_PER_PAGE', 24))
+    IMPORT_BATCH_SIZE = int(os.environ.get('IMPORT_BATCH_SIZE', 1000))
+    # Batas upload CSV di /product/import, terpisah dari MAX_CONTENT_LENGTH untuk gambar;
+    # file ditampung werkzeug di disk, jadi batas ini tidak memengaruhi pemakaian memori
+    IMPORT_MAX_BYTES = int(os.environ.get('IMPORT_MAX_BYTES', 200 * 1024 * 1024))
+    LAPORAN_CACHE_TTL = int(os.environ.get('LAPORAN_CACHE_TTL', 300))
+    # Data login (pemilik/karyawan) di-cache sekian detik agar tidak dicari ulang di setiap request
+    PRINCIPAL_CACHE_TTL = int(os.environ.get('PRINCIPAL_CACHE_TTL', 60))
+    # 'lru' (per proses) atau 'redis' (bersama antar worker)
+    CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'lru')
+    # Dengan 'lru' dan lebih dari satu worker, angka beranda bisa tertinggal paling lama sekian detik
+    DASHBOARD_LRU_TTL = int(os.environ.get('DASHBOARD_LRU_TTL', 60))
+    CACHE_LRU_SIZE = int(os.environ.get('CACHE_LRU_SIZE', 1024))
+    CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL', 'redis://localhost:6379/0')
@@ -0,0 +1,180 @@
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import event, func, case, and_
+from flask import current_app
+from sqlalchemy.orm import Session
+from models import db, RingkasanHarian
+from cache import cache
+from replica import using_replica
+
+INTERVALS = ('day', 'week', 'month')
+
+
+def _sum_when(column, condition):
+    return func.coalesce(func.sum(case((condition, column), else_=0)), 0)
+
+
+def period_totals(owner_id, today):
+    # Total hari ini, kemarin, bulan ini dan bulan lalu dari tabel ringkasan harian
+    yesterday = today - timedelta(days=1)
+    start_of_month = today.replace(day=1)
+    previous_month_start = (start_of_month - timedelta(days=1)).replace(day=1)
+    last_month = and_(RingkasanHarian.tanggal >= previous_month_start, RingkasanHarian.tanggal < start_of_month)
+
+    columns = []
+    for column in (RingkasanHarian.total_penjualan, RingkasanHarian.total_pembelian):
+        columns += [
+            _sum_when(column, RingkasanHarian.tanggal == today),
+            _sum_when(column, RingkasanHarian.tanggal == yesterday),
+            _sum_when(column, RingkasanHarian.tanggal >= start_of_month),
+            _sum_when(column, last_month),
+        ]
+
+    row = db.session.query(*columns) \
+                    .filter(RingkasanHarian.user_id == owner_id, RingkasanHarian.tanggal >= previous_month_start).one()
+
+    keys = ('today', 'yesterday', 'month', 'last_month')
+    sales = {key: row[i] or 0 for i, key in enumerate(keys)}
+    purchases = {key: row[i + 4] or 0 for i, key in enumerate(keys)}
+    return sales, purchases
+
+
+def format_increase(current, previous):
+    if previous != 0:
+        increase = (current - previous) / previous * 100
+    else:
+        increase = 0
+
+    increase = f"{increase:.2f}%"
+    if current > previous:
+        increase = f"+{increase}"
+    return increase
+
+
+def build_dashboard(sales, purchases):
+    daily_profit = sales['today'] - purchases['today']
+    daily_profit_yesterday = sales['yesterday'] - purchases['yesterday']
+    monthly_profit = sales['month'] - purchases['month']
+    monthly_profit_last_month = sales['last_month'] - purchases['last_month']
+
+    return {
+        # Pemasukan
+        'daily_sales': sales['today'],
+        'daily_increase': format_increase(sales['today'], sales['yesterday']),
+        'monthly_sales': sales['month'],
+        'monthly_increase': format_increase(sales['month'], sales['last_month']),
+        # Pengeluaran
+        'daily_purchases': purchases['today'],
+        'daily_purchases_increase': format_increase(purchases['today'], purchases['yesterday']),
+        'monthly_purchases': purchases['month'],
+        'monthly_purchases_increase': format_increase(purchases['month'], purchases['last_month']),
+        # Laba Bersih
+        'daily_profit': daily_profit,
+        'daily_profit_increase': format_increase(daily_profit, daily_profit_yesterday),
+        'monthly_profit': monthly_profit,
+        'monthly_profit_increase': format_increase(monthly_profit, monthly_profit_last_month),
+    }
+
+
+def _cache_key(owner_id, today):
+    return f'dashboard:{owner_id}:{today.isoformat()}'
+
+
+def _seconds_until_tomorrow():
+    now = datetime.now()
+    tomorrow = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+    return max(int((tomorrow - now).total_seconds()), 1)
+
+
+def _timeout(timeout):
+    # Dengan cache 'lru' invalidasi hanya terjadi di worker yang menyimpan transaksi;
+    # worker lain melihat perubahan paling lambat setelah DASHBOARD_LRU_TTL detik
+    if not cache.shared:
+        timeout = min(timeout, current_app.config.get('DASHBOARD_LRU_TTL', 60))
+    return timeout
+
+
+def get_dashboard_metrics(owner_id, today):
+    key = _cache_key(owner_id, today)
+    metrics = cache.get(key)
+    if metrics is None:
+        sales, purchases = period_totals(owner_id, today)
+        metrics = build_dashboard(sales, purchases)
+        timeout = _timeout(_seconds_until_tomorrow())
+        if using_replica(db.session):
+            # Replika bisa tertinggal dari primary; transaksi yang baru di-commit harus segera terlihat
+            timeout = min(timeout, current_app.config.get('REPLICA_CACHE_TTL', 60))
+        cache.set(key, metrics, timeout=timeout)
+    return metrics
+
+
+def invalidate_dashboard(owner_id):
+    # Panggil setelah commit transaksi penjualan/pembelian milik owner ini
+    cache.delete(_cache_key(owner_id, datetime.today().date()))
+
+
+def _bucket(tanggal, interval):
+    if interval == 'week':
+        return tanggal - timedelta(days=tanggal.weekday())
+    if interval == 'month':
+        return tanggal.replace(day=1)
+    return tanggal
+
+
+def daily_totals(owner_id, start, end):
+    # Penjualan dan pembelian per hari dari tabel ringkasan harian (sudah dikelompokkan per tanggal)
+    rows = db.session.query(RingkasanHarian.tanggal, RingkasanHarian.total_penjualan, RingkasanHarian.total_pembelian) \
+                     .filter(RingkasanHarian.user_id == owner_id,
+                             RingkasanHarian.tanggal >= start, RingkasanHarian.tanggal <= end)
+    return {tanggal.isoformat(): [penjualan or 0, pembelian or 0] for tanggal, penjualan, pembelian in rows}
+
+
+def _riwayat_version(owner_id):
+    key = f'riwayat-versi:{owner_id}'
+    version = cache.get(key)
+    if version is None:
+        version = time.time_ns()
+        # Di cache 'lru' versi ini hanya dibuang oleh worker yang meng-commit perubahan, jadi dibatasi umurnya
+        cache.set(key, version, timeout=None if cache.shared else current_app.config.get('DASHBOARD_LRU_TTL', 60))
+    return version
+
+
+def get_time_series(owner_id, today, days, interval='day'):
+    # Hari-hari sebelum hari ini jarang berubah, jadi di-cache sampai tengah malam;
+    # hanya baris hari ini yang selalu dibaca dari database
+    start = today - timedelta(days=days - 1)
+    yesterday = today - timedelta(days=1)
+
+    key = f'riwayat:{owner_id}:{_riwayat_version(owner_id)}:{start.isoformat()}:{today.isoformat()}'
+    totals = cache.get(key)
+    if totals is None:
+        totals = daily_totals(owner_id, start, yesterday)
+        cache.set(key, totals, timeout=_timeout(_seconds_until_tomorrow()))
+    totals = {**totals, **daily_totals(owner_id, today, today)}
+
+    buckets = {}
+    tanggal = start
+    while tanggal <= today:
+        bucket = _bucket(tanggal, interval)
+        item = buckets.setdefault(bucket, {'tanggal': bucket.isoformat(), 'penjualan': 0, 'pembelian': 0})
+        penjualan, pembelian = totals.get(tanggal.isoformat(), (0, 0))
+        item['penjualan'] += penjualan
+        item['pembelian'] += pembelian
+        tanggal += timedelta(days=1)
+
+    items = list(buckets.values())
+    for item in items:
+        item['laba'] = item['penjualan'] - item['pembelian']
+    return items
+
+
+def invalidate_riwayat(owner_id):
+    # Untuk perubahan pada tanggal sebelum hari ini; cache baru dibuang setelah commit
+    # supaya request lain tidak sempat menyimpan data lama
+    db.session.info.setdefault('riwayat_berubah', set()).add(owner_id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _hapus_riwayat(session):
+    for owner_id in session.info.pop('riwayat_berubah', ()):
+        cache.delete(f'riwayat-versi:{owner_id}')
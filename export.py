@@ -0,0 +1,64 @@
+import csv
+import io
+import tempfile
+from sqlalchemy import select
+from models import db, User, Karyawan, Product
+
+try:
+    from openpyxl import Workbook
+except ImportError:  # Tanpa openpyxl hanya ekspor CSV yang tersedia
+    Workbook = None
+
+HEADER = ['ID Transaksi', 'Tanggal', 'Pemilik/Karyawan', 'Produk', 'Kategori', 'Jumlah', 'Subtotal', 'Total Transaksi']
+YIELD_PER = 1000
+CHUNK_SIZE = 64 * 1024
+
+
+def export_rows(model, detail_model, filters):
+    # Satu baris per detail transaksi, diambil bertahap lewat server-side cursor
+    # filters: kondisi WHERE atas model (owner, tanggal, karyawan) dari pemanggil
+    query = select(model.id, model.tanggal, User.nama_pemilik, Karyawan.nama_karyawan, Product.name, Product.category,
+                   detail_model.jumlah, detail_model.subtotal, model.total_harga) \
+        .join(detail_model, detail_model.transaksi_id == model.id) \
+        .join(Product, Product.id == detail_model.product_id) \
+        .join(User, User.id == model.user_id) \
+        .outerjoin(Karyawan, Karyawan.id == model.karyawan_id) \
+        .where(*filters) \
+        .order_by(model.tanggal, model.id, detail_model.id) \
+        .execution_options(yield_per=YIELD_PER)
+
+    for row in db.session.execute(query):
+        transaksi_id, tanggal, nama_pemilik, nama_karyawan, produk, kategori, jumlah, subtotal, total = row
+        yield [transaksi_id, tanggal, nama_karyawan or nama_pemilik, produk, kategori, jumlah, subtotal, total]
+
+
+def stream_csv(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(HEADER)
+    for row in rows:
+        row[1] = row[1].isoformat()
+        writer.writerow(row)
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def stream_xlsx(rows, title):
+    # Mode write_only menulis baris langsung ke file sementara; hasilnya dikirim per potongan
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title)
+    sheet.append(HEADER)
+    for row in rows:
+        sheet.append(row)
+
+    with tempfile.TemporaryFile() as f:
+        workbook.save(f)
+        f.seek(0)
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
@@ -0,0 +1,85 @@
+import re
+from sqlalchemy import text, or_, case, Integer, Float
+from sqlalchemy.dialects.mysql import match
+from models import db, Product
+
+# MySQL mengabaikan kata yang lebih pendek dari innodb_ft_min_token_size (bawaan 3)
+MIN_TOKEN_LENGTH = 3
+
+SQLITE_SETUP = [
+    "CREATE VIRTUAL TABLE product_fts USING fts5(name, description, category, content='product', content_rowid='id')",
+    "CREATE TRIGGER product_fts_ai AFTER INSERT ON product BEGIN "
+    "INSERT INTO product_fts(rowid, name, description, category) VALUES (new.id, new.name, new.description, new.category); END",
+    "CREATE TRIGGER product_fts_ad AFTER DELETE ON product BEGIN "
+    "INSERT INTO product_fts(product_fts, rowid, name, description, category) "
+    "VALUES ('delete', old.id, old.name, old.description, old.category); END",
+    "CREATE TRIGGER product_fts_au AFTER UPDATE OF name, description, category ON product BEGIN "
+    "INSERT INTO product_fts(product_fts, rowid, name, description, category) "
+    "VALUES ('delete', old.id, old.name, old.description, old.category); "
+    "INSERT INTO product_fts(rowid, name, description, category) VALUES (new.id, new.name, new.description, new.category); END",
+    "INSERT INTO product_fts(product_fts) VALUES ('rebuild')",
+]
+
+
+def setup_fulltext():
+    # Dipanggil setelah db.create_all(); index dijaga sinkron oleh database sendiri
+    dialect = db.engine.dialect.name
+    with db.engine.begin() as conn:
+        if dialect == 'mysql':
+            exists = conn.execute(text(
+                "SELECT COUNT(*) FROM information_schema.statistics "
+                "WHERE table_schema = DATABASE() AND table_name = 'product' AND index_name = 'ft_product_search'"
+            )).scalar()
+            if not exists:
+                conn.execute(text("ALTER TABLE product ADD FULLTEXT INDEX ft_product_search (name, description, category)"))
+        elif dialect == 'sqlite':
+            exists = conn.execute(text(
+                "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = 'product_fts'"
+            )).scalar()
+            if not exists:
+                for statement in SQLITE_SETUP:
+                    conn.execute(text(statement))
+
+
+def _terms(query):
+    return [term for term in re.split(r'\W+', query.lower()) if term]
+
+
+def _like(column, pattern):
+    return column.ilike(pattern, escape='\\')
+
+
+def _fallback(query):
+    # Kata yang terlalu pendek untuk index full-text: LIKE biasa, awalan nama didahulukan.
+    # % dan _ dari input di-escape supaya dicari sebagai huruf biasa, bukan wildcard
+    query = query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    pattern = f'%{query}%'
+    rank = case((_like(Product.name, f'{query}%'), 0), (_like(Product.name, pattern), 1), else_=2)
+    condition = or_(_like(Product.name, pattern), _like(Product.description, pattern), _like(Product.category, pattern))
+    return condition, [rank, Product.name]
+
+
+def search_products(owner_id, query, page=1, per_page=24):
+    # Mengembalikan (produk di halaman ini, ada halaman berikutnya atau tidak)
+    query = query.strip()
+    terms = _terms(query)
+    products = Product.query.filter(Product.user_id == owner_id)
+    dialect = db.engine.dialect.name
+
+    if not terms:
+        products = products.order_by(Product.name)
+    elif dialect == 'mysql' and all(len(term) >= MIN_TOKEN_LENGTH for term in terms):
+        score = match(Product.name, Product.description, Product.category,
+                      against=' '.join(f'+{term}*' for term in terms)).in_boolean_mode()
+        products = products.filter(score).order_by(score.desc(), Product.name)
+    elif dialect == 'sqlite' and all(len(term) >= MIN_TOKEN_LENGTH for term in terms):
+        fts = text("SELECT rowid AS id, bm25(product_fts) AS rank FROM product_fts WHERE product_fts MATCH :q") \
+            .bindparams(q=' '.join(f'"{term}"*' for term in terms)) \
+            .columns(id=Integer, rank=Float).subquery()
+        products = products.join(fts, fts.c.id == Product.id).order_by(fts.c.rank, Product.name)
+    else:
+        condition, order = _fallback(query)
+        products = products.filter(condition).order_by(*order)
+
+    rows = products.offset((page - 1) * per_page).limit(per_page + 1).all()
+    return rows[:per_page], len(rows) > per_page
@@ -0,0 +1,223 @@
+import hashlib
+import io
+import os
+import re
+import shutil
+import tempfile
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from flask import Request, current_app, request, url_for
+from sqlalchemy.exc import IntegrityError
+from werkzeug.utils import secure_filename
+from models import db, Gambar
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Tanpa Pillow file disimpan apa adanya, tetap dengan nama hash
+    Image = None
+
+# Sisi terpanjang (px) untuk setiap ukuran turunan
+SIZES = {'thumb': 400, 'detail': 1200, 'avatar': 256}
+PRODUCT_SIZES = ('thumb', 'detail')
+PROFILE_SIZES = ('avatar', 'detail')
+QUALITY = 80
+CHUNK_SIZE = 64 * 1024
+PLACEHOLDER = 'images/alt-pic.jpg'
+
+HASHED_NAME = re.compile(r'^([0-9a-f]{16})\.webp$')
+
+
+class ImageBusy(Exception):
+    pass
+
+
+class _UploadFile(io.FileIO):
+    # Tujuan tulis werkzeug saat body multipart di-parse; data di atas batas tidak ditulis
+    def __init__(self, path, limit):
+        super().__init__(path, 'w+')
+        self.limit = limit
+        self.size = 0
+        self.too_large = False
+
+    def write(self, data):
+        self.size += len(data)
+        if self.size > self.limit:
+            self.too_large = True
+            return len(data)
+        return super().write(data)
+
+
+class UploadRequest(Request):
+    # File upload langsung ditulis werkzeug ke UPLOAD_TMP_FOLDER, tidak disalin lagi oleh save_image().
+    # Batas per file UPLOAD_MAX_BYTES, kecuali route mengisi request.max_file_size sendiri.
+    max_file_size = None
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        limit = self.max_file_size or current_app.config.get('UPLOAD_MAX_BYTES', 10 * 1024 * 1024)
+        path = os.path.join(image_processor.tmp_folder, uuid.uuid4().hex)
+        if 'upload_paths' not in self.__dict__:
+            self.upload_paths = []
+        self.upload_paths.append(path)
+        return io.BufferedRandom(_UploadFile(path, limit))
+
+
+def variant_name(filename, size):
+    found = HASHED_NAME.match(filename or '')
+    if not found:
+        return filename
+    return f'{found.group(1)}_{size}.webp'
+
+
+def image_url(folder, filename, size):
+    # folder relatif terhadap static/, mis. 'product_images' atau 'profile-pic'.
+    # Gambar lama (nama file asli) dikembalikan apa adanya; gambar yang masih
+    # diproses atau gagal diganti gambar bawaan (lihat image_status)
+    if not filename:
+        return url_for('static', filename=PLACEHOLDER)
+    path = f'{folder}/{variant_name(filename, size)}'
+    if HASHED_NAME.match(filename) and not os.path.exists(os.path.join(current_app.static_folder, path)):
+        return url_for('static', filename=PLACEHOLDER)
+    return url_for('static', filename=path)
+
+
+def image_status(filename):
+    # 'pending', 'ready' atau 'failed'; None untuk gambar lama yang tidak lewat pemrosesan
+    if not HASHED_NAME.match(filename or ''):
+        return None
+    return db.session.query(Gambar.status).filter(Gambar.nama == filename).scalar()
+
+
+def _set_status(nama, status):
+    # Ditulis lewat koneksi sendiri supaya tidak ikut transaksi request maupun worker lain
+    with db.engine.begin() as conn:
+        updated = conn.execute(Gambar.__table__.update().where(Gambar.nama == nama).values(status=status))
+        if updated.rowcount:
+            return
+    try:
+        with db.engine.begin() as conn:
+            conn.execute(Gambar.__table__.insert().values(nama=nama, status=status))
+    except IntegrityError:
+        with db.engine.begin() as conn:
+            conn.execute(Gambar.__table__.update().where(Gambar.nama == nama).values(status=status))
+
+
+def process_image(source, folder, filename, sizes):
+    # Decode sekali (JPEG langsung diperkecil saat decode), lalu simpan setiap ukuran sebagai WebP
+    with Image.open(source) as image:
+        image.draft('RGB', (max(SIZES[size] for size in sizes),) * 2)
+        image = ImageOps.exif_transpose(image)
+        image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+
+    for size in sizes:
+        resized = image.copy()
+        resized.thumbnail((SIZES[size], SIZES[size]))
+        path = os.path.join(folder, variant_name(filename, size))
+        # Nama sementara unik: upload isi yang sama bisa diproses dua worker bersamaan
+        tmp = f'{path}.{uuid.uuid4().hex}.tmp'
+        resized.save(tmp, 'WEBP', quality=QUALITY, method=4)
+        os.replace(tmp, path)
+
+
+class ImageProcessor:
+    # Upload ditulis ke disk oleh UploadRequest, lalu diproses oleh pool worker yang dibatasi
+    def __init__(self, app=None):
+        self.app = None
+        self.executor = None
+        self.slots = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.max_bytes = app.config.get('UPLOAD_MAX_BYTES', 10 * 1024 * 1024)
+        self.tmp_folder = app.config.get('UPLOAD_TMP_FOLDER') or os.path.join(tempfile.gettempdir(), 'notisq-upload')
+        os.makedirs(self.tmp_folder, exist_ok=True)
+        workers = app.config.get('IMAGE_WORKERS', 2)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='image')
+        self.slots = threading.BoundedSemaphore(workers + app.config.get('IMAGE_QUEUE_SIZE', 16))
+        self.timeout = app.config.get('IMAGE_QUEUE_TIMEOUT', 5)
+        app.request_class = UploadRequest
+        app.teardown_request(self._remove_uploads)
+
+    def _claim(self, file_storage):
+        # Ambil alih file upload yang sudah ditulis UploadRequest; pemanggil yang menghapusnya
+        raw = getattr(file_storage.stream, 'raw', None)
+        if isinstance(raw, _UploadFile):
+            request.upload_paths.remove(raw.name)
+            path = raw.name
+            too_large = raw.too_large
+        else:
+            path = os.path.join(self.tmp_folder, uuid.uuid4().hex)
+            file_storage.save(path)
+            too_large = os.path.getsize(path) > self.max_bytes
+        if too_large:
+            os.remove(path)
+            raise ValueError(f'Ukuran gambar melebihi batas {self.max_bytes // (1024 * 1024)} MB.')
+
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+        return path, digest.hexdigest()[:16]
+
+    def _remove_uploads(self, exc=None):
+        # File upload yang tidak diambil save_image() dihapus di akhir request
+        for path in getattr(request, 'upload_paths', ()):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def save(self, file_storage, folder, sizes):
+        path, digest = self._claim(file_storage)
+
+        if Image is None:
+            ext = os.path.splitext(secure_filename(file_storage.filename))[1].lower()
+            filename = digest + ext
+            shutil.move(path, os.path.join(folder, filename))
+            return filename
+
+        filename = f'{digest}.webp'
+        if all(os.path.exists(os.path.join(folder, variant_name(filename, size))) for size in sizes):
+            os.remove(path)
+            return filename
+
+        # Pastikan file memang gambar sebelum diterima; ini hanya membaca header
+        try:
+            with Image.open(path) as image:
+                image.verify()
+        except Exception:
+            os.remove(path)
+            raise ValueError('File yang diunggah bukan gambar yang valid.')
+
+        # Antrean penuh: tunggu sebentar lalu tolak, jangan pernah decode/resize di thread request
+        if not self.slots.acquire(timeout=self.timeout):
+            os.remove(path)
+            raise ImageBusy('Server sedang sibuk memproses gambar, silakan coba lagi sebentar.')
+        _set_status(filename, 'pending')
+        self.executor.submit(self._run, path, folder, filename, sizes)
+        return filename
+
+    def _run(self, path, folder, filename, sizes):
+        try:
+            with self.app.app_context():
+                self._process(path, folder, filename, sizes)
+        finally:
+            self.slots.release()
+
+    def _process(self, path, folder, filename, sizes):
+        try:
+            process_image(path, folder, filename, sizes)
+            _set_status(filename, 'ready')
+        except Exception:
+            current_app.logger.exception('Gagal memproses gambar %s', filename)
+            _set_status(filename, 'failed')
+        finally:
+            if os.path.exists(path):
+                os.remove(path)
+
+
+image_processor = ImageProcessor()
+
+
+def save_image(file_storage, folder, sizes):
+    return image_processor.save(file_storage, folder, sizes)
@@ -0,0 +1,122 @@
+import calendar
+from datetime import date
+from flask import current_app
+from sqlalchemy import event, func, insert
+from sqlalchemy.orm import Session
+from models import db, Product, TransaksiPenjualan, DetailTransaksiPenjualan, LaporanBulanan
+from cache import cache
+
+
+def month_bounds(bulan):
+    start = bulan.replace(day=1)
+    return start, start.replace(day=calendar.monthrange(start.year, start.month)[1])
+
+
+def product_profit(owner_id, start, end):
+    # Jumlah terjual, pendapatan dan HPP per produk dalam satu query GROUP BY.
+    # HPP memakai harga_beli produk saat laporan dihitung (harga beli per transaksi tidak disimpan).
+    rows = db.session.query(
+        Product.id, Product.name, Product.category,
+        func.sum(DetailTransaksiPenjualan.jumlah),
+        func.sum(DetailTransaksiPenjualan.subtotal),
+        func.sum(DetailTransaksiPenjualan.jumlah * Product.harga_beli),
+    ).join(DetailTransaksiPenjualan, DetailTransaksiPenjualan.product_id == Product.id) \
+     .join(TransaksiPenjualan, TransaksiPenjualan.id == DetailTransaksiPenjualan.transaksi_id) \
+     .filter(TransaksiPenjualan.user_id == owner_id,
+             TransaksiPenjualan.tanggal >= start, TransaksiPenjualan.tanggal <= end) \
+     .group_by(Product.id, Product.name, Product.category)
+
+    return [{'product_id': product_id, 'nama_produk': name, 'kategori': category,
+             'jumlah': jumlah or 0, 'pendapatan': pendapatan or 0, 'hpp': hpp or 0}
+            for product_id, name, category, jumlah, pendapatan, hpp in rows]
+
+
+def _with_margin(row):
+    laba = row['pendapatan'] - row['hpp']
+    margin = laba / row['pendapatan'] * 100 if row['pendapatan'] else 0
+    return {**row, 'laba': laba, 'margin': round(margin, 2)}
+
+
+def build_report(rows):
+    categories = {}
+    total = {'jumlah': 0, 'pendapatan': 0, 'hpp': 0}
+    for row in rows:
+        kategori = categories.setdefault(row['kategori'], {'kategori': row['kategori'], 'jumlah': 0, 'pendapatan': 0, 'hpp': 0})
+        for key in total:
+            kategori[key] += row[key]
+            total[key] += row[key]
+
+    by_revenue = lambda row: (-row['pendapatan'], row.get('nama_produk') or row['kategori'])
+    return {
+        'products': sorted((_with_margin(row) for row in rows), key=by_revenue),
+        'categories': sorted((_with_margin(row) for row in categories.values()), key=by_revenue),
+        'total': _with_margin(total),
+    }
+
+
+EMPTY_MONTH = {'product_id': 0, 'nama_produk': '', 'kategori': '', 'jumlah': 0, 'pendapatan': 0, 'hpp': 0}
+
+
+def _is_closed(bulan, today):
+    return bulan < today.replace(day=1)
+
+
+def _snapshot_rows(owner_id, bulan):
+    return [{'product_id': s.product_id, 'nama_produk': s.nama_produk, 'kategori': s.kategori,
+             'jumlah': s.jumlah, 'pendapatan': s.pendapatan, 'hpp': s.hpp}
+            for s in LaporanBulanan.query.filter_by(user_id=owner_id, bulan=bulan)]
+
+
+def save_snapshot(owner_id, bulan):
+    # Hitung dan simpan snapshot satu bulan dalam savepoint; snapshot lama diganti, pemanggil yang commit.
+    # Bulan tanpa penjualan disimpan sebagai satu baris penanda (product_id 0) supaya tidak dihitung ulang.
+    rows = product_profit(owner_id, *month_bounds(bulan))
+    with db.session.begin_nested():
+        LaporanBulanan.query.filter_by(user_id=owner_id, bulan=bulan).delete(synchronize_session=False)
+        db.session.execute(insert(LaporanBulanan), [{**row, 'user_id': owner_id, 'bulan': bulan}
+                                                    for row in rows or [EMPTY_MONTH]])
+    return rows
+
+
+def month_rows(owner_id, bulan, today):
+    # Bulan yang sudah tutup dibaca dari snapshot buatan `flask snapshot-laporan`; bulan berjalan dan
+    # bulan tanpa snapshot dihitung langsung. Request GET tidak pernah menulis snapshot.
+    if _is_closed(bulan, today):
+        rows = _snapshot_rows(owner_id, bulan)
+        if rows:
+            return [row for row in rows if row['product_id'] != EMPTY_MONTH['product_id']]
+    return product_profit(owner_id, *month_bounds(bulan))
+
+
+def _cache_key(owner_id, start, end):
+    return f'laporan:{owner_id}:{start.isoformat()}:{end.isoformat()}'
+
+
+def get_laporan(owner_id, start, end, today):
+    key = _cache_key(owner_id, start, end)
+    report = cache.get(key)
+    if report is None:
+        if (start, end) == month_bounds(start):
+            rows = month_rows(owner_id, start, today)
+        else:
+            rows = product_profit(owner_id, start, end)
+        report = build_report(rows)
+        cache.set(key, report, timeout=current_app.config.get('LAPORAN_CACHE_TTL', 300))
+    return report
+
+
+def invalidate_laporan(owner_id, tanggal):
+    # Dipanggil saat penjualan pada tanggal ini berubah. Snapshot dan cache bulan itu baru dibuang
+    # setelah commit, supaya request lain tidak sempat menyimpan data sebelum perubahan.
+    # Laporan rentang bebas yang mencakup tanggal ini baru diperbarui setelah cache-nya kedaluwarsa.
+    db.session.info.setdefault('laporan_berubah', set()).add((owner_id, tanggal.replace(day=1)))
+
+
+@event.listens_for(Session, 'after_commit')
+def _hapus_laporan(session):
+    for owner_id, bulan in session.info.pop('laporan_berubah', ()):
+        if _is_closed(bulan, date.today()):
+            with db.engine.begin() as conn:
+                conn.execute(LaporanBulanan.__table__.delete().where(LaporanBulanan.user_id == owner_id,
+                                                                     LaporanBulanan.bulan == bulan))
+        cache.delete(_cache_key(owner_id, *month_bounds(bulan)))
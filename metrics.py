@@ -0,0 +1,181 @@
+import hmac
+import math
+import os
+import threading
+import time
+from collections import Counter, deque
+from flask import Response, abort, current_app, g, has_request_context, jsonify, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Batas bucket histogram latensi (detik), sama dengan bawaan client Prometheus
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SAMPLES = 1000
+
+
+class EndpointStats:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.buckets = [0] * len(BUCKETS)
+        self.samples = deque(maxlen=SAMPLES)
+        self.queries = 0
+        self.db_time = 0.0
+        self.n_plus_one = 0
+        self.last_n_plus_one = None
+
+    def observe(self, duration, queries, db_time):
+        self.count += 1
+        self.total += duration
+        for i, bound in enumerate(BUCKETS):
+            if duration <= bound:
+                self.buckets[i] += 1
+        self.samples.append(duration)
+        self.queries += queries
+        self.db_time += db_time
+
+
+def _percentile(samples, p):
+    if not samples:
+        return 0
+    return samples[max(math.ceil(p * len(samples)) - 1, 0)]
+
+
+class RequestMetrics:
+    # Latensi per endpoint, jumlah query SQL dan waktu DB per request; aktif hanya bila METRICS_ENABLED.
+    # Statement yang sama berulang >= METRICS_N_PLUS_ONE kali dalam satu request dicatat sebagai N+1.
+    # Angka disimpan di memori proses: dengan beberapa worker, /stats dan /metrics hanya berisi data
+    # worker yang menjawab. Karena itu setiap seri diberi label pid; scrape tiap worker atau pakai satu worker.
+    def __init__(self, app=None):
+        self.endpoints = {}
+        self.threshold = 5
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if not app.config.get('METRICS_ENABLED'):
+            return
+        self.threshold = app.config.get('METRICS_N_PLUS_ONE', 5)
+        app.before_request(self._before_request)
+        app.teardown_request(self._teardown_request)
+        app.add_url_rule('/stats', 'stats', self.stats_view)
+        app.add_url_rule('/metrics', 'metrics', self.prometheus_view)
+        if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+            event.listen(Engine, 'handle_error', _handle_error)
+
+    def _before_request(self):
+        g.metrics = {'start': time.perf_counter(), 'queries': 0, 'db_time': 0.0, 'statements': Counter()}
+
+    def _teardown_request(self, exc=None):
+        # teardown (bukan after_request) supaya respons streaming ikut terhitung sampai selesai
+        data = g.pop('metrics', None)
+        if data is None:
+            return
+        duration = time.perf_counter() - data['start']
+        endpoint = request.endpoint or 'unknown'
+        repeated = [(statement, count) for statement, count in data['statements'].items() if count >= self.threshold]
+
+        with self._lock:
+            stats = self.endpoints.setdefault(endpoint, EndpointStats())
+            stats.observe(duration, data['queries'], data['db_time'])
+            if repeated:
+                stats.n_plus_one += 1
+                stats.last_n_plus_one = ' '.join(repeated[0][0].split())[:300]
+
+        for statement, count in repeated:
+            current_app.logger.warning('Kemungkinan N+1 di %s: statement dijalankan %d kali: %s',
+                                       endpoint, count, ' '.join(statement.split())[:300])
+
+    def snapshot(self):
+        with self._lock:
+            items = {endpoint: (stats, sorted(stats.samples)) for endpoint, stats in self.endpoints.items()}
+            result = {}
+            for endpoint, (stats, samples) in items.items():
+                result[endpoint] = {
+                    'count': stats.count,
+                    'p50': round(_percentile(samples, 0.50), 4),
+                    'p95': round(_percentile(samples, 0.95), 4),
+                    'p99': round(_percentile(samples, 0.99), 4),
+                    'avg': round(stats.total / stats.count, 4),
+                    'sql_per_request': round(stats.queries / stats.count, 2),
+                    'db_time_per_request': round(stats.db_time / stats.count, 4),
+                    'n_plus_one': stats.n_plus_one,
+                    'last_n_plus_one': stats.last_n_plus_one,
+                }
+        return {'pid': os.getpid(), 'endpoints': result}
+
+    def prometheus(self):
+        lines = [
+            '# HELP notisq_request_duration_seconds Latensi request per endpoint.',
+            '# TYPE notisq_request_duration_seconds histogram',
+        ]
+        pid = os.getpid()
+        with self._lock:
+            endpoints = sorted(self.endpoints.items())
+            for endpoint, stats in endpoints:
+                labels = f'endpoint="{endpoint}",pid="{pid}"'
+                for bound, count in zip(BUCKETS, stats.buckets):
+                    lines.append(f'notisq_request_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f'notisq_request_duration_seconds_bucket{{{labels},le="+Inf"}} {stats.count}')
+                lines.append(f'notisq_request_duration_seconds_sum{{{labels}}} {stats.total}')
+                lines.append(f'notisq_request_duration_seconds_count{{{labels}}} {stats.count}')
+
+            for name, kind, help_text, value in (
+                ('notisq_sql_queries_total', 'counter', 'Jumlah statement SQL per endpoint.', lambda s: s.queries),
+                ('notisq_sql_seconds_total', 'counter', 'Total waktu database per endpoint.', lambda s: s.db_time),
+                ('notisq_n_plus_one_total', 'counter', 'Request dengan statement SQL berulang.', lambda s: s.n_plus_one),
+            ):
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+                lines += [f'{name}{{endpoint="{endpoint}",pid="{pid}"}} {value(stats)}' for endpoint, stats in endpoints]
+        return '\n'.join(lines) + '\n'
+
+    def _authorized(self):
+        token = current_app.config.get('METRICS_TOKEN')
+        if not token:
+            return False
+        # Hanya lewat header: token di query string akan tercatat di access log server dan proxy
+        given = request.headers.get('Authorization', '')
+        if not given.startswith('Bearer '):
+            return False
+        given = given.removeprefix('Bearer ')
+        return hmac.compare_digest(given.encode(), token.encode())
+
+    def stats_view(self):
+        if not self._authorized():
+            abort(404)
+        return jsonify(self.snapshot())
+
+    def prometheus_view(self):
+        if not self._authorized():
+            abort(404)
+        return Response(self.prometheus(), mimetype='text/plain; version=0.0.4')
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and 'metrics' in g:
+        conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get('query_start')
+    if not starts or not has_request_context() or 'metrics' not in g:
+        return
+    data = g.metrics
+    data['db_time'] += time.perf_counter() - starts.pop()
+    data['queries'] += 1
+    data['statements'][statement] += 1
+
+
+def _handle_error(context):
+    # Statement yang gagal tidak sampai ke after_cursor_execute; buang waktu mulainya
+    # supaya daftar di koneksi pool tidak terus bertambah
+    if context.connection is not None:
+        starts = context.connection.info.get('query_start')
+        if starts:
+            starts.pop()
+
+
+metrics = RequestMetrics()
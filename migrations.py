@@ -0,0 +1,60 @@
+from sqlalchemy.exc import IntegrityError
+from models import db, SchemaMigration, Karyawan, Product, TransaksiPenjualan, TransaksiPembelian
+from fulltext import setup_fulltext
+from rollup import rebuild_rollup
+from cache import cache
+
+
+def _create_indexes(*columns):
+    # db.create_all() tidak menambah index ke tabel yang sudah ada; index diambil dari definisi di models.py
+    def migrate():
+        with db.engine.begin() as conn:
+            for model, name in columns:
+                index = next(index for index in model.__table__.indexes if index.name == name)
+                index.create(conn, checkfirst=True)
+    return migrate
+
+
+def _isi_ringkasan():
+    # Beranda hanya membaca ringkasan_harian; database lama perlu diisi dari transaksi yang sudah ada
+    rebuild_rollup()
+    cache.clear()
+
+
+# Urutan versi tidak boleh diubah; tambahkan migrasi baru di akhir.
+# Setiap migrasi harus aman dijalankan ulang pada database yang sudah dibuat oleh db.create_all().
+MIGRATIONS = [
+    (1, 'full-text index produk', setup_fulltext),
+    (2, 'index komposit owner/tanggal dan owner/nama', _create_indexes(
+        (TransaksiPenjualan, 'ix_transaksi_penjualan_user_tanggal'),
+        (TransaksiPembelian, 'ix_transaksi_pembelian_user_tanggal'),
+        (Product, 'ix_product_user_name'),
+        (Karyawan, 'ix_karyawan_owner_id'),
+    )),
+    (3, 'isi ringkasan harian dari transaksi lama', _isi_ringkasan),
+]
+
+
+def upgrade():
+    # Buat tabel yang belum ada lalu jalankan migrasi yang belum tercatat; mengembalikan migrasi yang dijalankan
+    db.create_all()
+    applied = {version for version, in db.session.query(SchemaMigration.version)}
+    db.session.rollback()
+
+    done = []
+    for version, nama, migrate in MIGRATIONS:
+        if version in applied:
+            continue
+        migrate()
+        try:
+            db.session.add(SchemaMigration(version=version, nama=nama))
+            db.session.commit()
+        except IntegrityError:
+            # Sudah dicatat oleh proses lain yang menjalankan upgrade bersamaan
+            db.session.rollback()
+        done.append((version, nama))
+    return done
+
+
+def current_version():
+    return db.session.query(db.func.max(SchemaMigration.version)).scalar() or 0
@@ -1,7 +1,8 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
+from replica import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -22,7 +23,7 @@ class Karyawan(db.Model):
     email = db.Column(db.String(100), nullable=False)
     phone = db.Column(db.String(15), nullable=False)
     profile_pic = db.Column(db.String(100), nullable=False)
-    owner_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    owner_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     owner = db.relationship('User', backref=db.backref('karyawan', lazy=True))
 
 class Product(db.Model):
@@ -39,6 +40,7 @@ class Product(db.Model):
     __table_args__ = (
         db.CheckConstraint('price >= 0', name='check_price_nonnegative'),
         db.CheckConstraint('stock >= 0', name='check_stock_nonnegative'),
+        db.Index('ix_product_user_name', 'user_id', 'name'),
     )
 
 class TransaksiPenjualan(db.Model):
@@ -50,6 +52,11 @@ class TransaksiPenjualan(db.Model):
     karyawan_id = db.Column(db.Integer, db.ForeignKey('karyawan.id'), nullable=True, index=True)
     karyawan = db.relationship('Karyawan', backref=db.backref('transaksis_penjualan', lazy=True))
 
+    __table_args__ = (
+        # Daftar, ekspor dan laporan selalu memfilter owner lalu rentang tanggal
+        db.Index('ix_transaksi_penjualan_user_tanggal', 'user_id', 'tanggal'),
+    )
+
 class DetailTransaksiPenjualan(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     transaksi_id = db.Column(db.Integer, db.ForeignKey('transaksi_penjualan.id'), nullable=False, index=True)
@@ -73,6 +80,10 @@ class TransaksiPembelian(db.Model):
     karyawan_id = db.Column(db.Integer, db.ForeignKey('karyawan.id'), nullable=True, index=True)
     karyawan = db.relationship('Karyawan', backref=db.backref('transaksis_pembelian', lazy=True))
 
+    __table_args__ = (
+        db.Index('ix_transaksi_pembelian_user_tanggal', 'user_id', 'tanggal'),
+    )
+
 class DetailTransaksiPembelian(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     transaksi_id = db.Column(db.Integer, db.ForeignKey('transaksi_pembelian.id'), nullable=False, index=True)
@@ -86,3 +97,45 @@ class DetailTransaksiPembelian(db.Model):
         db.CheckConstraint('jumlah >= 0', name='check_jumlah_nonnegative'),
         db.CheckConstraint('subtotal >= 0', name='check_subtotal_nonnegative'),
     )
+
+class RingkasanHarian(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    tanggal = db.Column(db.Date, nullable=False)
+    total_penjualan = db.Column(db.Float, nullable=False, default=0)
+    total_pembelian = db.Column(db.Float, nullable=False, default=0)
+    jumlah_penjualan = db.Column(db.Integer, nullable=False, default=0)
+    jumlah_pembelian = db.Column(db.Integer, nullable=False, default=0)
+    barang_terjual = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'tanggal', name='uq_ringkasan_user_tanggal'),
+    )
+
+class LaporanBulanan(db.Model):
+    # Snapshot laporan laba per produk untuk bulan yang sudah tutup
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    bulan = db.Column(db.Date, nullable=False)
+    product_id = db.Column(db.Integer, nullable=False)
+    nama_produk = db.Column(db.String(100), nullable=False)
+    kategori = db.Column(db.String(50), nullable=False)
+    jumlah = db.Column(db.Integer, nullable=False, default=0)
+    pendapatan = db.Column(db.Float, nullable=False, default=0)
+    hpp = db.Column(db.Float, nullable=False, default=0)
+
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'bulan', 'product_id', name='uq_laporan_user_bulan_produk'),
+    )
+
+class SchemaMigration(db.Model):
+    # Migrasi (lihat migrations.py) yang sudah dijalankan pada database ini
+    version = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    nama = db.Column(db.String(100), nullable=False)
+    dijalankan = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+class Gambar(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    nama = db.Column(db.String(100), unique=True, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='pending')
+    diperbarui = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
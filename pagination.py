@@ -0,0 +1,30 @@
+from datetime import datetime
+from sqlalchemy import or_, and_
+
+
+def encode_cursor(transaksi):
+    return f'{transaksi.tanggal.isoformat()}_{transaksi.id}'
+
+
+def decode_cursor(cursor):
+    try:
+        tanggal, transaksi_id = cursor.split('_', 1)
+        return datetime.strptime(tanggal, '%Y-%m-%d').date(), int(transaksi_id)
+    except (AttributeError, ValueError):
+        return None
+
+
+def keyset_page(query, model, cursor=None, limit=50):
+    # Urutan terbaru dulu berdasarkan (tanggal, id); halaman berikutnya dimulai setelah cursor
+    position = decode_cursor(cursor) if cursor else None
+    if position:
+        tanggal, transaksi_id = position
+        query = query.filter(or_(model.tanggal < tanggal,
+                                 and_(model.tanggal == tanggal, model.id < transaksi_id)))
+
+    rows = query.order_by(model.tanggal.desc(), model.id.desc()).limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1])
+    return rows, next_cursor
@@ -0,0 +1,100 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class PasswordBusy(Exception):
+    pass
+
+
+class PasswordHasher:
+    # Hash password dijalankan di pool thread terbatas (scrypt/pbkdf2 melepas GIL), jadi lonjakan login
+    # tidak membuat semua worker berebut CPU; antrean yang penuh ditolak setelah PASSWORD_HASH_TIMEOUT
+    def __init__(self, app=None):
+        self.method = 'scrypt'
+        self.executor = None
+        self.slots = None
+        self.timeout = 5
+        self._prefix = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.method = app.config.get('PASSWORD_HASH_METHOD', 'scrypt')
+        workers = app.config.get('PASSWORD_HASH_WORKERS', 2)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password')
+        self.slots = threading.BoundedSemaphore(workers + app.config.get('PASSWORD_HASH_QUEUE', 32))
+        self.timeout = app.config.get('PASSWORD_HASH_TIMEOUT', 5)
+        self._prefix = None
+
+    def _run(self, fn, *args):
+        if not self.slots.acquire(timeout=self.timeout):
+            raise PasswordBusy('Server sedang sibuk, silakan coba lagi sebentar.')
+        try:
+            return self.executor.submit(fn, *args).result()
+        finally:
+            self.slots.release()
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def check(self, stored, password):
+        return self._run(check_password_hash, stored, password)
+
+    def needs_rehash(self, stored):
+        # Hash lama (metode/cost berbeda dari PASSWORD_HASH_METHOD) diganti saat user berhasil login
+        if self._prefix is None:
+            self._prefix = generate_password_hash('', self.method).split('$', 1)[0]
+        return stored.split('$', 1)[0] != self._prefix
+
+
+class LoginLimiter:
+    # Batas login gagal per username dan per IP dalam satu jendela waktu, disimpan di memori proses.
+    # Dicek sebelum password di-hash, jadi serangan brute-force tidak menghabiskan CPU.
+    def __init__(self, app=None):
+        self.max_failures = 5
+        self.max_failures_ip = 30
+        self.window = 300
+        self.maxsize = 10000
+        self._failures = OrderedDict()
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.max_failures = app.config.get('LOGIN_MAX_FAILURES', 5)
+        self.max_failures_ip = app.config.get('LOGIN_MAX_FAILURES_IP', 30)
+        self.window = app.config.get('LOGIN_WINDOW', 300)
+
+    def _count(self, key, now):
+        item = self._failures.get(key)
+        if item is None or item[1] <= now:
+            return 0
+        return item[0]
+
+    def allow(self, username, ip):
+        now = time.time()
+        with self._lock:
+            return self._count(('user', username.lower()), now) < self.max_failures \
+                and self._count(('ip', ip), now) < self.max_failures_ip
+
+    def failed(self, username, ip):
+        now = time.time()
+        with self._lock:
+            for key in (('user', username.lower()), ('ip', ip)):
+                count = self._count(key, now)
+                expires_at = self._failures[key][1] if count else now + self.window
+                self._failures[key] = (count + 1, expires_at)
+                self._failures.move_to_end(key)
+            while len(self._failures) > self.maxsize:
+                self._failures.popitem(last=False)
+
+    def succeeded(self, username):
+        with self._lock:
+            self._failures.pop(('user', username.lower()), None)
+
+
+passwords = PasswordHasher()
+login_limiter = LoginLimiter()
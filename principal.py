@@ -0,0 +1,63 @@
+from flask import current_app, g, session
+from models import db, User, Karyawan
+from cache import cache
+
+
+def _cache_key(role, user_id):
+    return f'principal:{role}:{user_id}'
+
+
+def _load(role, user_id):
+    if role == 'pemilik':
+        row = db.session.query(User.id, User.nama_toko).filter(User.id == user_id).first()
+        if row is None:
+            return None
+        return {'id': row.id, 'role': role, 'owner_id': row.id, 'nama_toko': row.nama_toko}
+
+    # Nama toko tidak ikut disimpan untuk karyawan; diambil dari entri pemilik di current_principal()
+    row = db.session.query(Karyawan.id, Karyawan.owner_id).filter(Karyawan.id == user_id).first()
+    if row is None:
+        return None
+    return {'id': row.id, 'role': role, 'owner_id': row.owner_id}
+
+
+def _cached(role, user_id):
+    key = _cache_key(role, user_id)
+    principal = cache.get(key)
+    if principal is None:
+        principal = _load(role, user_id)
+        if principal is not None:
+            cache.set(key, principal, timeout=current_app.config.get('PRINCIPAL_CACHE_TTL', 60))
+    return principal
+
+
+def current_principal():
+    # User yang sedang login (pemilik atau karyawan) sebagai dict; dicari sekali per request
+    # lalu disimpan di g, dan di cache selama PRINCIPAL_CACHE_TTL detik antar request
+    if 'principal' in g:
+        return g.principal
+
+    principal = None
+    user_id = session.get('user_id')
+    role = session.get('role')
+    if user_id and role in ('pemilik', 'karyawan'):
+        principal = _cached(role, user_id)
+        if principal is not None and role == 'karyawan':
+            # Memakai entri pemilik, jadi forget_principal('pemilik', ...) juga berlaku untuk karyawannya
+            owner = _cached('pemilik', principal['owner_id']) if principal['owner_id'] else None
+            principal = {**principal, 'nama_toko': owner['nama_toko'] if owner else 'Toko Tidak Diketahui'}
+    g.principal = principal
+    return principal
+
+
+def current_owner_id():
+    principal = current_principal()
+    if principal is None:
+        return None
+    return session.get('owner_id') or principal['owner_id']
+
+
+def forget_principal(role, user_id):
+    # Panggil setelah data pemilik/karyawan diubah atau dihapus
+    cache.delete(_cache_key(role, user_id))
+    g.pop('principal', None)
@@ -0,0 +1,135 @@
+import csv
+import math
+from sqlalchemy import insert, update, select, func
+from sqlalchemy.exc import SQLAlchemyError
+from werkzeug.utils import secure_filename
+from models import db, Product
+
+REQUIRED = ('name', 'harga_beli', 'price', 'category')
+# Panjang maksimum mengikuti kolom di models.Product
+MAX_LENGTH = {'name': 100, 'category': 50, 'image': 100}
+MAX_ERRORS = 100
+
+
+class ImportResult:
+    def __init__(self):
+        self.inserted = 0
+        self.updated = 0
+        self.failed = 0
+        self.errors = []
+
+    def error(self, line, message):
+        # Semua kegagalan dihitung, tetapi hanya MAX_ERRORS pesan pertama yang disimpan
+        self.failed += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append((line, message))
+
+
+def _text(row, field, required=False):
+    value = (row.get(field) or '').strip()
+    if required and not value:
+        raise ValueError(f'Kolom {field} wajib diisi.')
+    if field in MAX_LENGTH and len(value) > MAX_LENGTH[field]:
+        raise ValueError(f'Kolom {field} lebih dari {MAX_LENGTH[field]} karakter.')
+    return value
+
+
+def _number(row, field, cast, required=True):
+    value = (row.get(field) or '').strip()
+    if not value:
+        if required:
+            raise ValueError(f'Kolom {field} wajib diisi.')
+        return None
+    try:
+        number = cast(value)
+    except ValueError:
+        raise ValueError(f'Kolom {field} bukan angka: {value!r}.')
+    # Sama dengan check constraint price >= 0 dan stock >= 0 di tabel product
+    if not math.isfinite(number) or number < 0:
+        raise ValueError(f'Kolom {field} tidak boleh negatif.')
+    return number
+
+
+def parse_row(row):
+    return {
+        'name': _text(row, 'name', required=True),
+        'description': _text(row, 'description'),
+        'harga_beli': _number(row, 'harga_beli', float),
+        'price': _number(row, 'price', float),
+        'stock': _number(row, 'stock', int, required=False),
+        'category': _text(row, 'category', required=True),
+        'image': secure_filename(_text(row, 'image')),
+    }
+
+
+def _write(owner_id, batch):
+    # Produk dengan nama yang sama (tanpa beda huruf besar/kecil) milik owner ini diperbarui, sisanya ditambahkan
+    existing = {name.lower(): product_id for name, product_id in db.session.execute(
+        select(Product.name, Product.id).where(Product.user_id == owner_id, func.lower(Product.name).in_(list(batch)))
+    )}
+
+    new_rows = []
+    changed = []
+    for key, (line, values) in batch.items():
+        if key in existing:
+            # Kolom opsional yang kosong/tidak ada di CSV tidak menimpa data produk yang sudah ada
+            values = {'id': existing[key], **{field: value for field, value in values.items() if value not in (None, '')}}
+            changed.append(values)
+        else:
+            new_rows.append({**values, 'stock': values['stock'] or 0, 'user_id': owner_id})
+
+    if new_rows:
+        db.session.execute(insert(Product), new_rows)
+    if changed:
+        db.session.execute(update(Product), changed)
+    db.session.commit()
+    return len(new_rows), len(changed)
+
+
+def _flush(owner_id, batch, result):
+    try:
+        inserted, updated = _write(owner_id, batch)
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        if len(batch) > 1:
+            # Satu baris yang ditolak database tidak boleh menggagalkan seluruh batch: ulangi per baris
+            for key, item in batch.items():
+                _flush(owner_id, {key: item}, result)
+            return
+        (line, _), = batch.values()
+        result.error(line, f'Gagal disimpan ke database: {str(getattr(e, "orig", e))[:200]}')
+        return
+
+    result.inserted += inserted
+    result.updated += updated
+
+
+def import_products(owner_id, stream, batch_size=1000):
+    # stream: file teks CSV dengan header name, description, harga_beli, price, stock, category, image.
+    # Dibaca per baris dan disimpan per batch, jadi memori tidak bergantung pada ukuran file.
+    reader = csv.DictReader(stream)
+    missing = [field for field in REQUIRED if field not in (reader.fieldnames or [])]
+    if missing:
+        raise ValueError(f'Header CSV tidak memiliki kolom: {", ".join(missing)}.')
+
+    result = ImportResult()
+    batch = {}
+    for row in reader:
+        try:
+            values = parse_row(row)
+        except ValueError as e:
+            result.error(reader.line_num, str(e))
+            continue
+
+        key = values['name'].lower()
+        if key in batch:
+            result.error(reader.line_num, f'Nama {values["name"]!r} sudah ada di baris {batch[key][0]}; baris ini dilewati.')
+            continue
+        batch[key] = (reader.line_num, values)
+        if len(batch) >= batch_size:
+            _flush(owner_id, batch, result)
+            batch = {}
+
+    if batch:
+        _flush(owner_id, batch, result)
+    return result
@@ -0,0 +1,121 @@
+import cProfile
+import io
+import os
+import pstats
+import re
+import tempfile
+import time
+from flask import current_app, g, has_request_context, request
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+HEADER = 'X-Profile-Token'
+QUERY_PARAM = '_profile'
+
+
+class RequestProfiler:
+    # Request dengan token bertanda tangan (header X-Profile-Token atau ?_profile=) dijalankan di bawah cProfile.
+    # Hasilnya (.prof, ringkasan .txt dan daftar SQL) ditulis ke PROFILER_DIR dengan batas jumlah dan umur file.
+    # Tanpa PROFILER_ENABLED tidak ada hook yang dipasang sama sekali.
+    # Token ditandatangani dengan PROFILER_SECRET dari environment, sama untuk semua worker dan CLI.
+    def __init__(self, app=None):
+        self.folder = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if not app.config.get('PROFILER_ENABLED'):
+            return
+        if not app.config.get('PROFILER_SECRET'):
+            raise ValueError('PROFILER_ENABLED membutuhkan PROFILER_SECRET.')
+        self.folder = app.config.get('PROFILER_DIR') or os.path.join(tempfile.gettempdir(), 'notisq-profiles')
+        os.makedirs(self.folder, exist_ok=True)
+        app.before_request(self._before_request)
+        app.teardown_request(self._teardown_request)
+        if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+            event.listen(Engine, 'handle_error', _handle_error)
+
+    def _serializer(self):
+        return URLSafeTimedSerializer(current_app.config['PROFILER_SECRET'], salt='notisq-profiler')
+
+    def make_token(self):
+        return self._serializer().dumps('profile')
+
+    def _triggered(self):
+        token = request.headers.get(HEADER) or request.args.get(QUERY_PARAM)
+        if not token:
+            return False
+        try:
+            self._serializer().loads(token, max_age=current_app.config.get('PROFILER_TOKEN_MAX_AGE', 3600))
+        except BadSignature:
+            return False
+        return True
+
+    def _before_request(self):
+        if not self._triggered():
+            return
+        g.profile_sql = []
+        g.profiler = cProfile.Profile()
+        g.profile_start = time.perf_counter()
+        g.profiler.enable()
+
+    def _teardown_request(self, exc=None):
+        profiler = g.pop('profiler', None)
+        if profiler is None:
+            return
+        profiler.disable()
+        duration = time.perf_counter() - g.pop('profile_start')
+        statements = g.pop('profile_sql', [])
+
+        endpoint = re.sub(r'[^A-Za-z0-9_.-]', '_', request.endpoint or 'unknown')
+        base = os.path.join(self.folder, f'{time.strftime("%Y%m%d-%H%M%S")}-{endpoint}-{int(duration * 1000)}ms')
+        profiler.dump_stats(f'{base}.prof')
+
+        summary = io.StringIO()
+        summary.write(f'{request.method} {request.full_path} {duration * 1000:.1f} ms, {len(statements)} statement SQL\n\n')
+        pstats.Stats(profiler, stream=summary).sort_stats('cumulative').print_stats(50)
+        with open(f'{base}.txt', 'w') as f:
+            f.write(summary.getvalue())
+        with open(f'{base}.sql', 'w') as f:
+            for elapsed, statement, parameters in statements:
+                f.write(f'-- {elapsed * 1000:.2f} ms, parameter: {parameters!r}\n{statement};\n\n')
+
+        self._prune()
+
+    def _prune(self):
+        # Hapus profil yang melebihi PROFILER_MAX_FILES (terlama dulu) atau lebih tua dari PROFILER_MAX_AGE detik
+        max_files = current_app.config.get('PROFILER_MAX_FILES', 50)
+        max_age = current_app.config.get('PROFILER_MAX_AGE', 7 * 24 * 3600)
+        profiles = sorted((entry for entry in os.scandir(self.folder) if entry.name.endswith('.prof')),
+                          key=lambda entry: entry.stat().st_mtime, reverse=True)
+        now = time.time()
+        for i, entry in enumerate(profiles):
+            if i >= max_files or now - entry.stat().st_mtime > max_age:
+                base = entry.path[:-len('.prof')]
+                for ext in ('.prof', '.txt', '.sql'):
+                    if os.path.exists(base + ext):
+                        os.remove(base + ext)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and 'profile_sql' in g:
+        conn.info.setdefault('profile_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get('profile_start')
+    if starts and has_request_context() and 'profile_sql' in g:
+        g.profile_sql.append((time.perf_counter() - starts.pop(), statement, parameters))
+
+
+def _handle_error(context):
+    if context.connection is not None:
+        starts = context.connection.info.get('profile_start')
+        if starts:
+            starts.pop()
+
+
+profiler = RequestProfiler()
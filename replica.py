@@ -0,0 +1,44 @@
+import time
+from functools import wraps
+from flask import current_app, has_request_context, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.sql import Select
+
+
+class RoutingSession(Session):
+    # SELECT dari route yang ditandai read_replica dibaca dari bind 'replica';
+    # flush, INSERT/UPDATE/DELETE dan semua query setelahnya tetap ke primary
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            if self._flushing or (clause is not None and not isinstance(clause, Select)):
+                self.info['menulis'] = True
+            elif self.info.get('replica') and not self.info.get('menulis') \
+                    and getattr(clause, '_for_update_arg', None) is None:
+                engine = self._db.engines.get('replica')
+                if engine is not None:
+                    return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _ingat_penulisan(db_session):
+    # Catat waktu menulis di session user supaya request berikutnya tidak membaca replika yang tertinggal
+    if db_session.info.pop('menulis', False) and has_request_context():
+        session['_db_tulis'] = time.time()
+
+
+def read_replica(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        db = current_app.extensions['sqlalchemy']
+        sticky = current_app.config.get('REPLICA_STICKY_SECONDS', 5)
+        if 'replica' in current_app.config.get('SQLALCHEMY_BINDS', {}) \
+                and time.time() - session.get('_db_tulis', 0) > sticky:
+            db.session.info['replica'] = True
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def using_replica(db_session):
+    return bool(db_session.info.get('replica'))
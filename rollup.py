@@ -0,0 +1,87 @@
+from datetime import date
+from sqlalchemy import func, insert
+from sqlalchemy.exc import IntegrityError
+from models import db, RingkasanHarian, TransaksiPenjualan, DetailTransaksiPenjualan, TransaksiPembelian
+from laporan import invalidate_laporan
+from dashboard import invalidate_riwayat
+
+
+def _get_or_create(owner_id, tanggal):
+    ringkasan = RingkasanHarian.query.filter_by(user_id=owner_id, tanggal=tanggal).first()
+    if ringkasan is None:
+        try:
+            with db.session.begin_nested():
+                ringkasan = RingkasanHarian(user_id=owner_id, tanggal=tanggal, total_penjualan=0, total_pembelian=0,
+                                            jumlah_penjualan=0, jumlah_pembelian=0, barang_terjual=0)
+                db.session.add(ringkasan)
+        except IntegrityError:
+            # Baris hari ini sudah dibuat oleh request lain
+            ringkasan = RingkasanHarian.query.filter_by(user_id=owner_id, tanggal=tanggal).one()
+    return ringkasan
+
+
+def apply_rollup(owner_id, tanggal, **deltas):
+    # Dipanggil sebelum commit agar ringkasan ikut dalam transaksi DB yang sama
+    deltas = {name: value for name, value in deltas.items() if value}
+    if not deltas:
+        return
+
+    ringkasan = _get_or_create(owner_id, tanggal)
+    values = {getattr(RingkasanHarian, name): getattr(RingkasanHarian, name) + value
+              for name, value in deltas.items()}
+    RingkasanHarian.query.filter_by(id=ringkasan.id).update(values, synchronize_session=False)
+    db.session.expire(ringkasan)
+
+    # Penjualan berubah: snapshot/cache laporan laba bulan itu tidak berlaku lagi
+    if 'total_penjualan' in deltas or 'barang_terjual' in deltas:
+        invalidate_laporan(owner_id, tanggal)
+    if tanggal < date.today():
+        invalidate_riwayat(owner_id)
+
+
+def rebuild_rollup(owner_id=None):
+    penjualan = db.session.query(
+        TransaksiPenjualan.user_id, TransaksiPenjualan.tanggal,
+        func.sum(TransaksiPenjualan.total_harga), func.count(TransaksiPenjualan.id),
+    ).group_by(TransaksiPenjualan.user_id, TransaksiPenjualan.tanggal)
+    terjual = db.session.query(
+        TransaksiPenjualan.user_id, TransaksiPenjualan.tanggal, func.sum(DetailTransaksiPenjualan.jumlah),
+    ).join(DetailTransaksiPenjualan, DetailTransaksiPenjualan.transaksi_id == TransaksiPenjualan.id) \
+     .group_by(TransaksiPenjualan.user_id, TransaksiPenjualan.tanggal)
+    pembelian = db.session.query(
+        TransaksiPembelian.user_id, TransaksiPembelian.tanggal,
+        func.sum(TransaksiPembelian.total_harga), func.count(TransaksiPembelian.id),
+    ).group_by(TransaksiPembelian.user_id, TransaksiPembelian.tanggal)
+
+    hapus = RingkasanHarian.query
+    if owner_id is not None:
+        penjualan = penjualan.filter(TransaksiPenjualan.user_id == owner_id)
+        terjual = terjual.filter(TransaksiPenjualan.user_id == owner_id)
+        pembelian = pembelian.filter(TransaksiPembelian.user_id == owner_id)
+        hapus = hapus.filter_by(user_id=owner_id)
+
+    rows = {}
+
+    def row(user_id, tanggal):
+        key = (user_id, tanggal)
+        if key not in rows:
+            rows[key] = {'user_id': user_id, 'tanggal': tanggal, 'total_penjualan': 0, 'total_pembelian': 0,
+                         'jumlah_penjualan': 0, 'jumlah_pembelian': 0, 'barang_terjual': 0}
+        return rows[key]
+
+    for user_id, tanggal, total, jumlah in penjualan:
+        r = row(user_id, tanggal)
+        r['total_penjualan'] = total or 0
+        r['jumlah_penjualan'] = jumlah
+    for user_id, tanggal, jumlah in terjual:
+        row(user_id, tanggal)['barang_terjual'] = jumlah or 0
+    for user_id, tanggal, total, jumlah in pembelian:
+        r = row(user_id, tanggal)
+        r['total_pembelian'] = total or 0
+        r['jumlah_pembelian'] = jumlah
+
+    hapus.delete(synchronize_session=False)
+    if rows:
+        db.session.execute(insert(RingkasanHarian), list(rows.values()))
+    db.session.commit()
+    return len(rows)
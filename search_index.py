@@ -0,0 +1,182 @@
+import bisect
+import threading
+import time
+from collections import OrderedDict
+from models import db, Product
+
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _word_suffixes(key):
+    # Potongan nama mulai dari awal setiap kata selain kata pertama
+    return [key[i:] for i in range(1, len(key)) if key[i - 1] == ' ' and key[i] != ' ']
+
+
+class ProductIndex:
+    # Index produk milik satu owner: daftar nama terurut untuk awalan nama/kata,
+    # trigram untuk pencarian di tengah kata
+    def __init__(self, rows):
+        self.products = {}
+        self.trigrams = {}
+        self.keys = []
+        self.words = []
+        self.lock = threading.Lock()
+        self.loaded_at = time.time()
+        for row in rows:
+            row['key'] = row['name'].lower()
+            self.products[row['id']] = row
+            self.keys.append((row['key'], row['id']))
+            self.words.extend((suffix, row['id']) for suffix in _word_suffixes(row['key']))
+            for trigram in _trigrams(row['key']):
+                self.trigrams.setdefault(trigram, set()).add(row['id'])
+        self.keys.sort()
+        self.words.sort()
+
+    def add(self, row):
+        with self.lock:
+            self._remove(row['id'])
+            row['key'] = row['name'].lower()
+            self.products[row['id']] = row
+            bisect.insort(self.keys, (row['key'], row['id']))
+            for suffix in _word_suffixes(row['key']):
+                bisect.insort(self.words, (suffix, row['id']))
+            for trigram in _trigrams(row['key']):
+                self.trigrams.setdefault(trigram, set()).add(row['id'])
+
+    def remove(self, product_id):
+        with self.lock:
+            self._remove(product_id)
+
+    def _remove(self, product_id):
+        row = self.products.pop(product_id, None)
+        if row is None:
+            return
+        _discard(self.keys, (row['key'], product_id))
+        for suffix in _word_suffixes(row['key']):
+            _discard(self.words, (suffix, product_id))
+        for trigram in _trigrams(row['key']):
+            ids = self.trigrams.get(trigram)
+            if ids is not None:
+                ids.discard(product_id)
+                if not ids:
+                    del self.trigrams[trigram]
+
+    def search(self, query, limit=20):
+        # Urutan hasil: awalan nama (nama yang sama persis paling atas), awalan kata, lalu sisanya
+        query = query.lower()
+        found = []
+        seen = set()
+
+        def collect(ids):
+            for product_id in ids:
+                if len(found) >= limit:
+                    return
+                if product_id not in seen:
+                    seen.add(product_id)
+                    found.append(self.products[product_id])
+
+        with self.lock:
+            collect(_prefix_ids(self.keys, query))
+            collect(_prefix_ids(self.words, query))
+            if len(found) < limit:
+                if len(query) >= 3:
+                    sets = sorted((self.trigrams.get(trigram, set()) for trigram in _trigrams(query)), key=len)
+                    candidates = sorted((self.products[product_id]['key'], product_id)
+                                        for product_id in set.intersection(*sets) - seen)
+                else:
+                    candidates = self.keys
+                collect(product_id for key, product_id in candidates if query in key)
+
+        return [{name: value for name, value in row.items() if name != 'key'} for row in found]
+
+
+def _prefix_ids(entries, query):
+    i = bisect.bisect_left(entries, (query,))
+    while i < len(entries) and entries[i][0].startswith(query):
+        yield entries[i][1]
+        i += 1
+
+
+def _discard(entries, entry):
+    i = bisect.bisect_left(entries, entry)
+    if i < len(entries) and entries[i] == entry:
+        del entries[i]
+
+
+class ProductSearchIndex:
+    # Index per owner dibuat saat pertama dicari lalu diperbarui oleh route yang mengubah produk/stok.
+    # Perubahan dari worker lain baru terlihat setelah TTL habis.
+    def __init__(self, app=None):
+        self.max_owners = 100
+        self.ttl = 300
+        self._indexes = OrderedDict()
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.max_owners = app.config.get('SEARCH_INDEX_MAX_OWNERS', 100)
+        self.ttl = app.config.get('SEARCH_INDEX_TTL', 300)
+
+    def _load(self, owner_id, product_ids=None):
+        query = db.session.query(Product.id, Product.name, Product.price, Product.harga_beli, Product.stock) \
+                          .filter(Product.user_id == owner_id)
+        if product_ids is not None:
+            query = query.filter(Product.id.in_(product_ids))
+        return [{'id': row.id, 'name': row.name, 'price': row.price, 'harga_beli': row.harga_beli, 'stock': row.stock}
+                for row in query]
+
+    def _cached(self, owner_id):
+        with self._lock:
+            index = self._indexes.get(owner_id)
+            if index is None:
+                return None
+            if time.time() - index.loaded_at > self.ttl:
+                del self._indexes[owner_id]
+                return None
+            self._indexes.move_to_end(owner_id)
+            return index
+
+    def get(self, owner_id):
+        index = self._cached(owner_id)
+        if index is None:
+            index = ProductIndex(self._load(owner_id))
+            with self._lock:
+                self._indexes[owner_id] = index
+                while len(self._indexes) > self.max_owners:
+                    self._indexes.popitem(last=False)
+        return index
+
+    def search(self, owner_id, query, limit=20):
+        return self.get(owner_id).search(query, limit)
+
+    def refresh(self, owner_id, product_ids):
+        # Panggil setelah commit; owner yang belum punya index akan dimuat saat dicari
+        index = self._cached(owner_id)
+        if index is None or not product_ids:
+            return
+        product_ids = set(product_ids)
+        for row in self._load(owner_id, product_ids):
+            index.add(row)
+            product_ids.discard(row['id'])
+        for product_id in product_ids:
+            index.remove(product_id)
+
+    def forget(self, owner_id):
+        # Untuk perubahan besar (mis. import CSV): index dimuat ulang saat owner ini mencari lagi
+        with self._lock:
+            self._indexes.pop(owner_id, None)
+
+    def remove(self, owner_id, product_id):
+        index = self._cached(owner_id)
+        if index is not None:
+            index.remove(product_id)
+
+    def clear(self):
+        with self._lock:
+            self._indexes.clear()
+
+
+product_index = ProductSearchIndex()
@@ -0,0 +1,80 @@
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from app import create_app
+from models import db, User, Product
+
+
+@pytest.fixture
+def make_app(tmp_path):
+    # create_app() dengan database SQLite sementara; keyword lain menimpa nilai config
+    apps = []
+
+    def make(**overrides):
+        class TestConfig(Config):
+            TESTING = True
+            SECRET_KEY = 'test'
+            SQLALCHEMY_DATABASE_URI = f'sqlite:///{tmp_path / "notisq.db"}'
+            # timeout: request paralel menunggu kunci tulis SQLite, bukan langsung gagal "database is locked"
+            SQLALCHEMY_ENGINE_OPTIONS = {'connect_args': {'timeout': 30}}
+            SQLALCHEMY_BINDS = {}
+            AUTO_UPGRADE_DB = True
+            ASSETS_FINGERPRINT = False
+
+        for key, value in overrides.items():
+            setattr(TestConfig, key, value)
+        app = create_app(TestConfig)
+        apps.append(app)
+        with app.app_context():
+            if User.query.filter_by(username='pemilik').first() is None:
+                db.session.add(User(nama_toko='Toko Uji', nama_pemilik='Pemilik', username='pemilik', password='-',
+                                    email='pemilik@example.com', phone='0800', profile_pic='default.png',
+                                    role='pemilik'))
+                db.session.commit()
+        return app
+
+    yield make
+    for app in apps:
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app()
+
+
+@pytest.fixture
+def owner_id(app):
+    with app.app_context():
+        return User.query.filter_by(username='pemilik').one().id
+
+
+@pytest.fixture
+def make_client(app, owner_id):
+    # Client yang sudah login sebagai pemilik, tanpa melewati hash password
+    def make():
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['user_id'] = owner_id
+            session['owner_id'] = owner_id
+            session['role'] = 'pemilik'
+        return client
+    return make
+
+
+@pytest.fixture
+def make_product(app, owner_id):
+    def make(name, stock, price=10000):
+        with app.app_context():
+            product = Product(name=name, description='-', harga_beli=price // 2, price=price, stock=stock,
+                              category='umum', image='', user_id=owner_id)
+            db.session.add(product)
+            db.session.commit()
+            return product.id
+    return make
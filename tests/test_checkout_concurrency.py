@@ -0,0 +1,44 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from sqlalchemy import func
+from models import db, Product, TransaksiPenjualan, DetailTransaksiPenjualan
+
+
+def checkout(client, items):
+    data = {'tanggal': date.today().isoformat(),
+            'products[][product_id]': [str(product_id) for product_id, _ in items],
+            'products[][quantity]': [str(quantity) for _, quantity in items]}
+    return client.post('/transaksi_baru', data=data)
+
+
+def run_parallel(make_client, carts, workers=8):
+    clients = [make_client() for _ in carts]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(checkout, clients, carts))
+
+
+def test_parallel_checkouts_do_not_lose_updates(app, make_client, make_product):
+    bola = make_product('Bola', stock=100)
+    raket = make_product('Raket', stock=100)
+    # Urutan produk di keranjang dibalik pada sebagian checkout
+    carts = [[(bola, 2), (raket, 1)] if i % 2 else [(raket, 1), (bola, 2)] for i in range(30)]
+
+    responses = run_parallel(make_client, carts)
+
+    assert all(response.status_code == 302 for response in responses)
+    with app.app_context():
+        assert db.session.get(Product, bola).stock == 100 - 30 * 2
+        assert db.session.get(Product, raket).stock == 100 - 30
+        assert TransaksiPenjualan.query.count() == 30
+
+
+def test_parallel_checkouts_never_oversell(app, make_client, make_product):
+    bola = make_product('Bola', stock=25)
+
+    run_parallel(make_client, [[(bola, 1)] for _ in range(40)])
+
+    with app.app_context():
+        assert db.session.get(Product, bola).stock == 0
+        assert TransaksiPenjualan.query.count() == 25
+        terjual = db.session.query(func.sum(DetailTransaksiPenjualan.jumlah)).scalar()
+        assert terjual == 25
@@ -0,0 +1,46 @@
+from datetime import date
+import pytest
+from sqlalchemy import event
+from models import db, TransaksiPenjualan, DetailTransaksiPenjualan, TransaksiPembelian, DetailTransaksiPembelian
+
+
+def add_transaksi(app, owner_id, make_product, model, detail_model, lines):
+    product_ids = [make_product(f'Produk {model.__name__} {lines}-{i}', stock=10) for i in range(lines)]
+    with app.app_context():
+        transaksi = model(user_id=owner_id, total_harga=lines * 10000, tanggal=date.today())
+        db.session.add(transaksi)
+        db.session.flush()
+        for product_id in product_ids:
+            db.session.add(detail_model(transaksi_id=transaksi.id, product_id=product_id, jumlah=1, subtotal=10000))
+        db.session.commit()
+        return transaksi.id
+
+
+def count_queries(app, client, url):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        response = client.get(url)
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+    assert response.status_code == 200
+    return len(statements)
+
+
+@pytest.mark.parametrize('model, detail_model, url', [
+    (TransaksiPenjualan, DetailTransaksiPenjualan, '/transaksi-penjualan/{}'),
+    (TransaksiPembelian, DetailTransaksiPembelian, '/transaksi-pembelian/{}'),
+])
+def test_detail_query_count_does_not_grow_with_lines(app, owner_id, make_client, make_product, model, detail_model, url):
+    kecil = add_transaksi(app, owner_id, make_product, model, detail_model, 2)
+    besar = add_transaksi(app, owner_id, make_product, model, detail_model, 40)
+    client = make_client()
+    client.get(url.format(kecil))
+
+    assert count_queries(app, client, url.format(besar)) == count_queries(app, client, url.format(kecil))
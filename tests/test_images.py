@@ -0,0 +1,83 @@
+import io
+import threading
+import time
+import pytest
+from PIL import Image
+import images
+from images import image_processor
+from models import db, Gambar, Product
+
+
+@pytest.fixture
+def upload_app(make_app, tmp_path):
+    (tmp_path / 'produk').mkdir()
+    return make_app(PRODUCT_IMAGE_FOLDER=str(tmp_path / 'produk'), UPLOAD_TMP_FOLDER=str(tmp_path / 'upload'),
+                    IMAGE_QUEUE_TIMEOUT=0)
+
+
+def png(color='red'):
+    data = io.BytesIO()
+    Image.new('RGB', (600, 400), color).save(data, 'PNG')
+    data.seek(0)
+    return data
+
+
+def new_product(app, image):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = 1
+        session['role'] = 'pemilik'
+    data = {'name': 'Bola', 'description': '-', 'harga_beli': '5000', 'price': '9000', 'category': 'olahraga',
+            'image': (image, 'bola.png')}
+    return client.post('/product/new', data=data, content_type='multipart/form-data')
+
+
+def wait_status(app, nama, timeout=10):
+    deadline = time.monotonic() + timeout
+    with app.app_context():
+        while time.monotonic() < deadline:
+            status = db.session.query(Gambar.status).filter(Gambar.nama == nama).scalar()
+            db.session.rollback()
+            if status != 'pending':
+                return status
+            time.sleep(0.05)
+    return 'pending'
+
+
+def test_upload_is_processed_in_background_without_extra_copy(upload_app, tmp_path):
+    response = new_product(upload_app, png())
+
+    assert response.status_code == 302
+    with upload_app.app_context():
+        nama = Product.query.one().image
+    assert wait_status(upload_app, nama) == 'ready'
+    assert sorted(p.name for p in (tmp_path / 'produk').iterdir()) == \
+        sorted(images.variant_name(nama, size) for size in images.PRODUCT_SIZES)
+    assert list((tmp_path / 'upload').iterdir()) == []
+
+
+def test_full_queue_is_rejected_not_processed_inline(upload_app, tmp_path, monkeypatch):
+    def inline(*args):
+        assert threading.current_thread().name.startswith('image'), 'gambar diproses di thread request'
+    monkeypatch.setattr(images, 'process_image', inline)
+    monkeypatch.setattr(image_processor, 'slots', threading.BoundedSemaphore(1))
+    image_processor.slots.acquire()
+
+    response = new_product(upload_app, png())
+
+    assert response.status_code == 503
+    with upload_app.app_context():
+        assert Product.query.count() == 0
+    assert list((tmp_path / 'upload').iterdir()) == []
+
+
+def test_oversized_upload_is_not_written_past_limit(upload_app, tmp_path, monkeypatch):
+    monkeypatch.setattr(image_processor, 'max_bytes', 1024)
+    upload_app.config['UPLOAD_MAX_BYTES'] = 1024
+
+    response = new_product(upload_app, png('blue'))
+
+    assert response.status_code == 302
+    with upload_app.app_context():
+        assert Product.query.count() == 0
+    assert list((tmp_path / 'upload').iterdir()) == []
@@ -0,0 +1,39 @@
+from datetime import date, timedelta
+from cache import cache
+from laporan import get_laporan, invalidate_laporan, month_bounds, _cache_key
+from models import db, LaporanBulanan
+
+BULAN_LALU = (date.today().replace(day=1) - timedelta(days=1)).replace(day=1)
+
+
+def test_report_page_does_not_write_snapshots(app, make_client):
+    response = make_client().get('/laporan', query_string={'bulan': f'{BULAN_LALU:%Y-%m}'})
+
+    assert response.status_code == 200
+    with app.app_context():
+        assert LaporanBulanan.query.count() == 0
+
+
+def test_empty_month_snapshot_is_stored_as_marker(app, owner_id):
+    result = app.test_cli_runner().invoke(args=['snapshot-laporan'])
+
+    assert result.exit_code == 0, result.output
+    with app.app_context():
+        assert LaporanBulanan.query.filter_by(user_id=owner_id, bulan=BULAN_LALU).count() == 1
+        report = get_laporan(owner_id, *month_bounds(BULAN_LALU), date.today())
+        assert report['products'] == [] and report['total']['pendapatan'] == 0
+
+
+def test_invalidation_waits_for_commit(app, owner_id):
+    app.test_cli_runner().invoke(args=['snapshot-laporan'])
+    key = _cache_key(owner_id, *month_bounds(BULAN_LALU))
+
+    with app.app_context():
+        get_laporan(owner_id, *month_bounds(BULAN_LALU), date.today())
+        invalidate_laporan(owner_id, BULAN_LALU + timedelta(days=3))
+        assert cache.get(key) is not None
+        assert LaporanBulanan.query.filter_by(user_id=owner_id, bulan=BULAN_LALU).count() == 1
+
+        db.session.commit()
+        assert cache.get(key) is None
+        assert LaporanBulanan.query.filter_by(user_id=owner_id, bulan=BULAN_LALU).count() == 0
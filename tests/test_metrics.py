@@ -0,0 +1,33 @@
+import pytest
+from flask import g
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from metrics import metrics
+from models import db
+
+
+def test_failed_statement_does_not_leave_start_time(app):
+    app.config['METRICS_ENABLED'] = True
+    metrics.init_app(app)
+
+    with app.test_request_context('/'):
+        app.preprocess_request()
+        assert 'metrics' in g
+        conn = db.session.connection()
+        for _ in range(3):
+            with pytest.raises(OperationalError):
+                conn.execute(text('SELECT * FROM tabel_tidak_ada'))
+            db.session.rollback()
+            conn = db.session.connection()
+        conn.execute(text('SELECT 1'))
+        assert not conn.info.get('query_start')
+        assert g.metrics['queries'] == 1
+
+
+def test_token_only_accepted_in_header(make_app):
+    app = make_app(METRICS_ENABLED=True, METRICS_TOKEN='rahasia')
+    client = app.test_client()
+
+    assert client.get('/stats', query_string={'token': 'rahasia'}).status_code == 404
+    assert client.get('/stats', headers={'Authorization': 'rahasia'}).status_code == 404
+    assert client.get('/stats', headers={'Authorization': 'Bearer rahasia'}).status_code == 200
@@ -0,0 +1,26 @@
+from flask import session
+from models import db, User, Karyawan
+from principal import current_principal, forget_principal
+
+
+def test_employee_sees_shop_rename_immediately(app, owner_id):
+    with app.app_context():
+        karyawan = Karyawan(nama_karyawan='Kasir', username='kasir', password='-', email='kasir@example.com',
+                            phone='0801', profile_pic='default.png', owner_id=owner_id)
+        db.session.add(karyawan)
+        db.session.commit()
+        karyawan_id = karyawan.id
+
+    def principal_karyawan():
+        with app.test_request_context():
+            session.update(user_id=karyawan_id, role='karyawan', karyawan_id=karyawan_id)
+            return current_principal()
+
+    assert principal_karyawan()['nama_toko'] == 'Toko Uji'
+
+    with app.test_request_context():
+        db.session.get(User, owner_id).nama_toko = 'Toko Baru'
+        db.session.commit()
+        forget_principal('pemilik', owner_id)
+
+    assert principal_karyawan()['nama_toko'] == 'Toko Baru'
@@ -0,0 +1,70 @@
+import io
+from sqlalchemy import text
+from models import db, Product
+from product_import import import_products
+
+
+def run_import(app, owner_id, text):
+    with app.app_context():
+        return import_products(owner_id, io.StringIO(text))
+
+
+def test_update_keeps_stock_and_description_missing_from_csv(app, owner_id):
+    run_import(app, owner_id, 'name,description,harga_beli,price,stock,category\nBola,Bola kaki,5000,9000,50,olahraga\n')
+    result = run_import(app, owner_id, 'name,harga_beli,price,category\nBola,6000,10000,olahraga\n')
+
+    assert (result.inserted, result.updated) == (0, 1)
+    with app.app_context():
+        product = Product.query.one()
+        assert (product.stock, product.description, product.price) == (50, 'Bola kaki', 10000)
+
+
+def test_explicit_zero_stock_is_applied(app, owner_id):
+    run_import(app, owner_id, 'name,harga_beli,price,stock,category\nBola,5000,9000,50,olahraga\n')
+    run_import(app, owner_id, 'name,harga_beli,price,stock,category\nBola,5000,9000,0,olahraga\n')
+
+    with app.app_context():
+        assert Product.query.one().stock == 0
+
+
+def test_matching_ignores_case(app, owner_id, make_product):
+    make_product('Apple', stock=5)
+    result = run_import(app, owner_id, 'name,harga_beli,price,category\napple,5000,9000,buah\n')
+
+    assert (result.inserted, result.updated) == (0, 1)
+    with app.app_context():
+        assert Product.query.count() == 1
+
+
+def test_import_route_accepts_csv_larger_than_image_limit(app, make_client):
+    app.config['MAX_CONTENT_LENGTH'] = 1024
+    rows = ''.join(f'Produk {i},5000,9000,olahraga\n' for i in range(200))
+    data = {'file': (io.BytesIO(f'name,harga_beli,price,category\n{rows}'.encode()), 'produk.csv')}
+
+    response = make_client().post('/product/import', data=data, content_type='multipart/form-data')
+
+    assert response.status_code == 200
+    with app.app_context():
+        assert Product.query.count() == 200
+
+
+def test_duplicate_names_in_file_are_reported(app, owner_id):
+    result = run_import(app, owner_id, 'name,harga_beli,price,category\nBola,5000,9000,olahraga\nbola,6000,9500,olahraga\n')
+
+    assert (result.inserted, result.failed) == (1, 1)
+    assert result.errors[0][0] == 3
+    with app.app_context():
+        assert Product.query.one().harga_beli == 5000
+
+
+def test_rejected_row_does_not_fail_whole_batch(app, owner_id):
+    with app.app_context():
+        with db.engine.begin() as conn:
+            conn.execute(text("CREATE TRIGGER tolak_rusak BEFORE INSERT ON product WHEN NEW.name = 'Rusak' "
+                              "BEGIN SELECT RAISE(ABORT, 'produk ditolak'); END"))
+
+    result = run_import(app, owner_id, 'name,harga_beli,price,category\n'
+                                       'Bola,5000,9000,olahraga\nRusak,1,2,x\nRaket,5000,9000,olahraga\n')
+
+    assert (result.inserted, result.failed) == (2, 1)
+    assert result.errors[0][0] == 3 and 'produk ditolak' in result.errors[0][1]
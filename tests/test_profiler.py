@@ -0,0 +1,31 @@
+import os
+import subprocess
+import sys
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_enabled_without_secret_is_refused(make_app, tmp_path):
+    with pytest.raises(ValueError):
+        make_app(PROFILER_ENABLED=True, PROFILER_SECRET=None, PROFILER_DIR=str(tmp_path / 'profil'))
+
+
+def test_token_from_cli_is_accepted_by_server(make_app, tmp_path):
+    folder = tmp_path / 'profil'
+    env = {**os.environ, 'PROFILER_ENABLED': '1', 'PROFILER_SECRET': 'rahasia', 'PROFILER_DIR': str(folder),
+           'DATABASE_URL': f'sqlite:///{tmp_path / "cli.db"}', 'ASSETS_FINGERPRINT': '0'}
+    # Proses terpisah, seperti `flask profiler-token` di server produksi
+    token = subprocess.run([sys.executable, '-m', 'flask', '--app', 'app.py', 'profiler-token'], cwd=ROOT, env=env,
+                           capture_output=True, text=True, check=True).stdout.strip()
+
+    app = make_app(PROFILER_ENABLED=True, PROFILER_SECRET='rahasia', PROFILER_DIR=str(folder))
+    client = app.test_client()
+
+    client.get('/login', query_string={'_profile': token + 'x'})
+    assert not list(folder.glob('*.prof'))
+
+    client.get('/login', headers={'X-Profile-Token': token})
+    profiles = list(folder.glob('*.prof'))
+    assert len(profiles) == 1
+    assert profiles[0].with_suffix('.sql').exists()
@@ -0,0 +1,12 @@
+from fulltext import search_products
+
+
+def test_short_query_wildcards_are_literal(app, owner_id, make_product):
+    make_product('Bola', stock=1)
+    make_product('Kabel_USB', stock=1)
+    make_product('Diskon 5%', stock=1)
+
+    with app.app_context():
+        assert [p.name for p in search_products(owner_id, '_')[0]] == ['Kabel_USB']
+        assert [p.name for p in search_products(owner_id, '5%')[0]] == ['Diskon 5%']
+        assert [p.name for p in search_products(owner_id, 'bo')[0]] == ['Bola']